@@ -24,8 +24,11 @@ def main(bot: MainChatbot):
 
         try:
             # Process the user's input using the bot and display the response
-            response = bot.process_user_input({"customer_input": user_input})
-            print(f"Bot: {response}")
+            # as it is generated
+            tokens = bot.stream_user_input({"customer_input": user_input})
+            for position, token in enumerate(tokens):
+                print("Bot: " + token if position == 0 else token, end="", flush=True)
+            print()
         except Exception as e:
             # Handle any exceptions and prompt the user to try again
             print(f"Error: {str(e)}")
@@ -0,0 +1,144 @@
+"""
+Import-time benchmark for the lightweight entry points of the package.
+
+Each module is imported in a fresh interpreter. The benchmark fails when an import
+takes longer than its budget or when a heavy dependency (LangChain integrations,
+OpenAI, semantic-router, torch, transformers) leaks into its import path.
+
+Usage:
+    python -m benchmarks.import_time [--budget FACTOR] [--repeat N] [--json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# Root of the repository, used as the working directory of the subprocesses
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay cheap to import, with their budget in seconds
+IMPORT_BUDGETS = {
+    "company_name": 0.05,
+    "company_name.data.loader": 0.05,
+    "company_name.chatbot.router.auxiliar": 0.05,
+    "company_name.chatbot.router.loader": 0.5,
+}
+
+# Top-level packages that must never be imported by the modules above
+HEAVY_DEPENDENCIES = [
+    "langchain",
+    "langchain_community",
+    "langchain_core",
+    "langchain_openai",
+    "openai",
+    "semantic_router",
+    "sentence_transformers",
+    "torch",
+    "transformers",
+]
+
+# Code run in the subprocess: import the module and report time and leaked packages
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = {heavy!r}
+leaked = sorted({{name.split(".")[0] for name in sys.modules}} & set(heavy))
+print(json.dumps({{"elapsed": elapsed, "leaked": leaked}}))
+"""
+
+
+def measure_import(module: str) -> Dict:
+    """Import a module in a fresh interpreter.
+
+    Args:
+        module: Dotted name of the module to import.
+
+    Returns:
+        A dictionary with the import time in seconds and the leaked heavy packages.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_DEPENDENCIES)],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(budget_scale: float = 1.0, repeat: int = 3) -> List[Dict]:
+    """Measure every module in `IMPORT_BUDGETS`.
+
+    Args:
+        budget_scale: Factor applied to every budget, for slower machines.
+        repeat: Number of fresh imports per module, the fastest one is kept.
+
+    Returns:
+        A list with the measurement and verdict of each module.
+    """
+    results = []
+
+    for module, budget in IMPORT_BUDGETS.items():
+        measurements = [measure_import(module) for _ in range(repeat)]
+        elapsed = min(measurement["elapsed"] for measurement in measurements)
+        leaked = sorted({name for m in measurements for name in m["leaked"]})
+
+        results.append(
+            {
+                "module": module,
+                "elapsed": elapsed,
+                "budget": budget * budget_scale,
+                "leaked": leaked,
+                "passed": not leaked and elapsed <= budget * budget_scale,
+            }
+        )
+
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=1.0,
+        help="Factor applied to every import budget (default: 1.0).",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Fresh imports per module (default: 3)."
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the results as JSON."
+    )
+    args = parser.parse_args()
+
+    results = run(budget_scale=args.budget, repeat=args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        for result in results:
+            status = "ok" if result["passed"] else "FAIL"
+            print(
+                f"{status:4} {result['module']:45} "
+                f"{result['elapsed'] * 1000:8.1f} ms (budget {result['budget'] * 1000:.0f} ms)"
+            )
+            if result["leaked"]:
+                print(
+                    f"     heavy dependencies imported: {', '.join(result['leaked'])}"
+                )
+
+    return 0 if all(result["passed"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
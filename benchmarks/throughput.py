@@ -0,0 +1,348 @@
+"""
+Offline throughput benchmark of the chatbot turn pipeline.
+
+The bot is built with a scripted chat model, a fake order agent, a fake RAG chain
+and, by default, a hashing encoder for the router, so no API or model download is
+needed. The synthetic intentions are replayed through `process_user_input`, and
+the benchmark reports the throughput and the p50/p95/p99 latency of every stage
+recorded by the metrics registry. Results can be saved as a baseline, and later
+runs fail when a stage or the throughput regresses beyond a tolerance.
+
+Usage:
+    python -m benchmarks.throughput [--repeat N] [--llm-latency SECONDS]
+        [--encoder {hashing,model}] [--baseline PATH] [--save-baseline PATH]
+        [--tolerance FRACTION] [--json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+# Dimension of the hashing encoder embeddings
+HASHING_DIM = 384
+
+# Latency regressions smaller than this many seconds are ignored as noise
+MIN_REGRESSION = 0.001
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic chat model answering every prompt of the chatbot offline.
+
+    Product identification prompts get a JSON answer listing the catalog products
+    named in the query; every other prompt gets a fixed-length text answer.
+    """
+
+    product_names: List[str] = []
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        """Build the answer to a prompt."""
+        system = messages[0].content if messages else ""
+        query = messages[-1].content.lower() if messages else ""
+
+        if "product identification system" in system:
+            products = [name for name in self.product_names if name.lower() in query]
+            return json.dumps({"results": [{"category": None, "products": products}]})
+
+        return "Thank you for reaching out. " * 8
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        message = AIMessage(content=self._respond(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = AIMessage(content=self._respond(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def hashing_encoder(texts: List[str]) -> np.ndarray:
+    """Embed texts as hashed bags of words and word bigrams, without any model."""
+    vectors = np.zeros((len(texts), HASHING_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = re.findall(r"[0-9a-z]+", text.lower())
+        for token in words + [" ".join(pair) for pair in zip(words, words[1:])]:
+            vectors[row, zlib.crc32(token.encode("utf-8")) % HASHING_DIM] += 1.0
+    return vectors
+
+
+def build_classifier(encoder: str):
+    """Build the router classifier, with the hashing encoder or the real model."""
+    from company_name.chatbot.router.artifact import (
+        DEFAULT_SCORE_THRESHOLD,
+        read_layer_config,
+    )
+    from company_name.chatbot.router.classifier import IntentClassifier
+    from company_name.chatbot.router.loader import FILE_PATH, load_intention_classifier
+
+    if encoder == "model":
+        return load_intention_classifier()
+
+    config = read_layer_config(FILE_PATH)
+    utterances, utterance_routes = [], []
+    for route in config["routes"]:
+        utterances.extend(route["utterances"])
+        utterance_routes.extend([route["name"]] * len(route["utterances"]))
+
+    return IntentClassifier(
+        hashing_encoder,
+        hashing_encoder(utterances),
+        utterance_routes,
+        [route["name"] for route in config["routes"]],
+        [
+            (
+                route["score_threshold"]
+                if route.get("score_threshold") is not None
+                else DEFAULT_SCORE_THRESHOLD
+            )
+            for route in config["routes"]
+        ],
+    )
+
+
+def build_bot(llm_latency: float = 0.0, encoder: str = "hashing"):
+    """Build a MainChatbot whose external dependencies are all offline fakes.
+
+    Args:
+        llm_latency: Seconds every fake LLM, agent and RAG call sleeps.
+        encoder: "hashing" for the model-free router encoder, "model" for the
+            compiled route layer and its sentence encoder.
+
+    Returns:
+        The bot, logged in to a benchmark session.
+    """
+    from company_name.chatbot.bot import MainChatbot
+    from company_name.chatbot.chains.summary import SummaryChain
+    from company_name.chatbot.memory import MemoryManager
+    from company_name.data.catalog import get_product_catalog
+
+    llm = ScriptedChatModel(
+        product_names=list(get_product_catalog().products), latency=llm_latency
+    )
+
+    def fake_agent(inputs: Dict) -> Dict:
+        time.sleep(llm_latency)
+        return {"output": f"Your request was recorded, {inputs['customer_id']}."}
+
+    def fake_rag(inputs: Dict) -> AIMessage:
+        time.sleep(llm_latency)
+        return AIMessage(content="Our support team is available every day.")
+
+    bot = MainChatbot(
+        llm=llm,
+        agent=RunnableLambda(fake_agent),
+        rag=RunnableLambda(fake_rag),
+        intention_classifier=build_classifier(encoder),
+        # Sessions and journals go to the temporary working directory of `run`
+        memory=MemoryManager(
+            spill_path="sessions.db",
+            summarize=SummaryChain(llm=llm).summarize,
+            journal_dir=".",
+        ),
+    )
+
+    # The chitchat and LLM re-routing chains are not part of the benchmark
+    bot.intent_handlers[None] = lambda user_input, session: llm.invoke(
+        user_input["customer_input"]
+    ).content
+
+    bot.user_login("benchmark", "throughput")
+    return bot
+
+
+def load_messages() -> List[str]:
+    """Load the messages of the synthetic intentions, in insertion order.
+
+    The messages go through the message store, so those still in its log are
+    included.
+    """
+    from company_name.chatbot.router.auxiliar import iter_messages
+
+    return [item["Message"] for item in iter_messages("synthetic_intetions.json")]
+
+
+def run(
+    repeat: int = 3,
+    warmup: int = 1,
+    llm_latency: float = 0.0,
+    encoder: str = "hashing",
+) -> Dict:
+    """Replay the synthetic intentions through the bot.
+
+    Runs in a temporary working directory, so the session, journal and cache
+    files start empty and do not leak into the repository.
+
+    Args:
+        repeat: Number of measured passes over the messages.
+        warmup: Number of unmeasured passes run first.
+        llm_latency: Seconds every fake LLM, agent and RAG call sleeps.
+        encoder: Router encoder, see `build_bot`.
+
+    Returns:
+        The throughput, the number of failed turns and the stage latencies.
+    """
+    from company_name.chatbot.metrics import get_metrics
+
+    messages = load_messages()
+    previous_dir = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            bot = build_bot(llm_latency=llm_latency, encoder=encoder)
+
+            errors = 0
+            elapsed = 0.0
+            for iteration in range(warmup + repeat):
+                if iteration == warmup:
+                    get_metrics().reset()
+                    errors = 0
+
+                start = time.perf_counter()
+                for message in messages:
+                    try:
+                        # Silence the intent prints of the bot
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            bot.process_user_input({"customer_input": message})
+                    except Exception:
+                        errors += 1
+                if iteration >= warmup:
+                    elapsed += time.perf_counter() - start
+
+            bot.memory.journal.close()
+        finally:
+            os.chdir(previous_dir)
+
+    turns = len(messages) * repeat
+    return {
+        "turns": turns,
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": turns / elapsed if elapsed else 0.0,
+        "stages": get_metrics().to_json(),
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.2) -> List[str]:
+    """Compare results against a baseline.
+
+    Args:
+        results: Results of `run`.
+        baseline: Results of a previous run.
+        tolerance: Allowed relative slowdown of the throughput and stage p95s.
+
+    Returns:
+        A description of every regression, empty if there is none.
+    """
+    regressions = []
+
+    if results["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {results['throughput']:.1f} turns/s "
+            f"< baseline {baseline['throughput']:.1f} turns/s"
+        )
+
+    for stage, expected in baseline["stages"].items():
+        current = results["stages"].get(stage)
+        if current is None:
+            continue
+        limit = max(expected["p95"] * (1 + tolerance), expected["p95"] + MIN_REGRESSION)
+        if current["p95"] > limit:
+            regressions.append(
+                f"{stage} p95 {current['p95'] * 1000:.2f} ms "
+                f"> baseline {expected['p95'] * 1000:.2f} ms"
+            )
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Measured passes (default: 3)."
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=1, help="Unmeasured passes (default: 1)."
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.0,
+        help="Seconds every fake LLM call sleeps (default: 0).",
+    )
+    parser.add_argument(
+        "--encoder",
+        choices=["hashing", "model"],
+        default="hashing",
+        help="Router encoder (default: hashing, which needs no model).",
+    )
+    parser.add_argument("--baseline", help="Baseline JSON file to compare against.")
+    parser.add_argument("--save-baseline", help="Write the results to this file.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative regression (default: 0.2).",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the results as JSON."
+    )
+    args = parser.parse_args()
+
+    results = run(
+        repeat=args.repeat,
+        warmup=args.warmup,
+        llm_latency=args.llm_latency,
+        encoder=args.encoder,
+    )
+
+    regressions: List[str] = []
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.json:
+        print(json.dumps({**results, "regressions": regressions}, indent=4))
+    else:
+        print(
+            f"{results['turns']} turns in {results['seconds']:.2f} s: "
+            f"{results['throughput']:.1f} turns/s, {results['errors']} errors"
+        )
+        print(f"{'stage':20} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage, summary in results["stages"].items():
+            print(
+                f"{stage:20} {summary['count']:7d} {summary['p50'] * 1000:9.2f} "
+                f"{summary['p95'] * 1000:9.2f} {summary['p99'] * 1000:9.2f}"
+            )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+    return 1 if regressions or results["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
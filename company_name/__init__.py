@@ -1,4 +1,31 @@
-from company_name.chatbot.bot import MainChatbot
-from company_name.chatbot.dev_bot import DevChatbot
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["MainChatbot", "DevChatbot"]
+if TYPE_CHECKING:
+    from company_name.chatbot.bot import MainChatbot
+    from company_name.chatbot.dev_bot import DevChatbot
+    from company_name.chatbot.session import SessionContext
+
+__all__ = ["MainChatbot", "DevChatbot", "SessionContext"]
+
+# Modules defining the public classes, imported on first attribute access so that
+# importing the package does not pull in LangChain, OpenAI or the router encoder
+_LAZY_IMPORTS = {
+    "MainChatbot": "company_name.chatbot.bot",
+    "DevChatbot": "company_name.chatbot.dev_bot",
+    "SessionContext": "company_name.chatbot.session",
+}
+
+
+def __getattr__(name: str):
+    """Import a public class the first time it is accessed."""
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(_LAZY_IMPORTS[name])
+        value = getattr(module, name)
+        globals()[name] = value  # Cache it so later lookups skip this hook
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,27 +1,78 @@
 # Import necessary classes and modules for chatbot functionality
-from typing import Callable, Dict, Optional
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 
-from company_name.chatbot.agents.agent1 import Agent1
 from company_name.chatbot.chains.chain3 import ReasoningChain3, ResponseChain3
+from company_name.chatbot.chains.chain4 import ReasoningChain4, ResponseChain4
+from company_name.chatbot.chains.summary import SummaryChain
 from company_name.chatbot.memory import MemoryManager
+from company_name.chatbot.metrics import get_metrics
+from company_name.chatbot.response_cache import SemanticResponseCache
+from company_name.chatbot.router.classifier import IntentClassifier
 from company_name.chatbot.router.loader import load_intention_classifier
+from company_name.chatbot.session import SessionContext
+from company_name.chatbot.speculation import Speculator
 
 
 class MainChatbot:
     """A bot that handles customer service interactions by processing user inputs and
     routing them through configured reasoning and response chains.
+
+    A single instance can serve many conversations concurrently: every turn method
+    accepts a `SessionContext`, and falls back to the session set by `user_login`
+    when none is given.
     """
 
-    def __init__(self):
-        """Initialize the bot with session and language model configurations."""
-        # Initialize the memory manager to manage session history
-        self.memory = MemoryManager()
+    def __init__(
+        self,
+        llm=None,
+        agent=None,
+        rag=None,
+        intention_classifier: Optional[IntentClassifier] = None,
+        memory: Optional[MemoryManager] = None,
+        speculative: bool = False,
+        speculation_margin: float = 0.05,
+    ):
+        """Initialize the bot with session and language model configurations.
 
+        Args:
+            llm: Chat model used by every chain, `gpt-4o-mini` by default.
+            agent: Runnable handling order intents, the order agent by default.
+            rag: Runnable answering support questions, the RAG pipeline by default.
+            intention_classifier: Router classifier, the compiled route layer by default.
+            memory: Session memory, stored in the package state directory by default.
+            speculative: Whether the asynchronous path starts side-effect-free
+                stages, such as product reasoning, while the intent is classified.
+            speculation_margin: Router score margin under which the stages of the
+                two best candidate intents are both started.
+        """
         # Configure the language model with specific parameters for response generation
-        self.llm = ChatOpenAI(temperature=0.0, model="gpt-4o-mini")
+        self.llm = llm or ChatOpenAI(temperature=0.0, model="gpt-4o-mini")
+
+        # Initialize the memory manager to manage session history, folding old
+        # turns into a rolling summary so prompts stay within a token budget
+        self.memory = memory or MemoryManager(
+            summarize=SummaryChain(llm=self.llm).summarize
+        )
+
+        # Default session used when a turn does not provide its own
+        self.session: Optional[SessionContext] = None
 
         # Map intent names to their corresponding reasoning and response chains
         self.chain_map = {
@@ -30,48 +81,120 @@ class MainChatbot:
                 "response": self.add_memory_to_runnable(
                     ResponseChain3(llm=self.llm)  # Response chain with memory
                 ),
-            }
+                # History-free response chain, whose answers can be cached
+                "cacheable_response": ResponseChain3(llm=self.llm, memory=False),
+            },
+            "order_status": {
+                # Local order number extraction and database lookup
+                "reasoning": ReasoningChain4(llm=self.llm),
+                "response": self.add_memory_to_runnable(ResponseChain4(llm=self.llm)),
+            },
         }
 
-        self.agent_map = {
-            "order": self.add_memory_to_runnable(Agent1(llm=self.llm).agent_executor)
-        }
+        if agent is None:
+            # Imported here, so bots given their agent do not need its dependencies
+            from company_name.chatbot.agents.agent1 import Agent1
 
-        self.rag = self.add_memory_to_runnable(
-            RAGPipeline(
+            agent = Agent1(llm=self.llm).agent_executor
+        self.agent_map = {"order": self.add_memory_to_runnable(agent)}
+
+        if rag is None:
+            rag = RAGPipeline(
                 index_name="rag",
                 embeddings_model="text-embedding-3-small",
                 llm=self.llm,
                 memory=True,
             ).rag_chain
-        )
+        self.rag = self.add_memory_to_runnable(rag)
 
         # Map of intentions to their corresponding handlers
-        self.intent_handlers: Dict[Optional[str], Callable[[Dict[str, str]], str]] = {
+        self.intent_handlers: Dict[
+            Optional[str], Callable[[Dict[str, str], Optional[SessionContext]], str]
+        ] = {
             "product_information": self.handle_product_information,
             "create_order": self.handle_order_intent,
-            "order_status": self.handle_order_intent,
+            "order_status": self.handle_order_status,
             "support_information": self.handle_support_information,
         }
 
+        # Asynchronous counterparts of the intent handlers
+        self.async_intent_handlers: Dict[
+            Optional[str],
+            Callable[[Dict[str, str], Optional[SessionContext]], Awaitable[str]],
+        ] = {
+            "product_information": self.ahandle_product_information,
+            "create_order": self.ahandle_order_intent,
+            "order_status": self.ahandle_order_status,
+            "support_information": self.ahandle_support_information,
+        }
+
+        # Streaming counterparts of the intent handlers, yielding response tokens
+        self.stream_intent_handlers: Dict[
+            Optional[str],
+            Callable[[Dict[str, str], Optional[SessionContext]], Iterator[str]],
+        ] = {
+            "product_information": self.stream_product_information,
+            "create_order": self.stream_order_intent,
+            "order_status": self.stream_order_status,
+            "support_information": self.stream_support_information,
+        }
+        self.async_stream_intent_handlers: Dict[
+            Optional[str],
+            Callable[[Dict[str, str], Optional[SessionContext]], AsyncIterator[str]],
+        ] = {
+            "product_information": self.astream_product_information,
+            "create_order": self.astream_order_intent,
+            "order_status": self.astream_order_status,
+            "support_information": self.astream_support_information,
+        }
+
         # Load the intention classifier to determine user intents
-        self.intention_classifier = load_intention_classifier()
+        self.intention_classifier = intention_classifier or load_intention_classifier()
+
+        # Embeddings computed by the router, reused by the semantic response cache
+        self.query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._embeddings_lock = threading.Lock()
+
+        # Semantic cache of final responses for intents whose answer only depends
+        # on the query and the resolved products, generated without the session
+        # history so they can be served to every conversation
+        self.response_cache = SemanticResponseCache()
+        self.cacheable_intents = {"product_information"}
+
+        # Opt-in speculative execution of side-effect-free stages, by intent
+        self.speculative = speculative
+        self.speculation_margin = speculation_margin
+        self.speculator = Speculator()
+        self.speculative_stages: Dict[str, Callable[[Dict[str, str]], Awaitable]] = {
+            "product_information": self._speculate_product_information,
+        }
 
     def user_login(self, user_id: str, conversation_id: str) -> None:
-        """Log in a user by setting the user and conversation identifiers.
+        """Log in a user by setting the default session of the bot.
 
         Args:
             user_id: Identifier for the user.
             conversation_id: Identifier for the conversation.
         """
-        self.user_id = user_id
-        self.conversation_id = conversation_id
-        self.memory_config = {
-            "configurable": {
-                "user_id": self.user_id,
-                "conversation_id": self.conversation_id,
-            }
-        }
+        self.session = SessionContext(user_id=user_id, conversation_id=conversation_id)
+
+    def get_session(self, session: Optional[SessionContext] = None) -> SessionContext:
+        """Resolve the session of a turn.
+
+        Args:
+            session: The session of the turn, or None to use the logged in session.
+
+        Returns:
+            The session the turn belongs to.
+
+        Raises:
+            ValueError: If no session is given and no user is logged in.
+        """
+        if session is not None:
+            return session
+        if self.session is None:
+            raise ValueError("No session provided and no user logged in.")
+        return self.session
 
     def add_memory_to_runnable(self, original_runnable):
         """Wrap a runnable with session history functionality.
@@ -84,7 +207,7 @@ class MainChatbot:
         """
         return RunnableWithMessageHistory(
             original_runnable,
-            self.memory.get_session_history,  # Retrieve session history
+            self.memory.get_prompt_history,  # Retrieve token-budgeted session history
             input_messages_key="customer_input",  # Key for user inputs
             history_messages_key="chat_history",  # Key for chat history
             history_factory_config=self.memory.get_history_factory_config(),  # Config for history factory
@@ -105,6 +228,29 @@ class MainChatbot:
         """
         return self.chain_map[intent]["reasoning"], self.chain_map[intent]["response"]
 
+    def get_response_chain(self, intent: str, reasoning_output: Dict):
+        """Retrieve the response chain for the output of the reasoning chain.
+
+        Cacheable queries are answered by the history-free response chain of the
+        intent, so the answer can be reused by other conversations.
+
+        Args:
+            intent: The identified intent of the user input.
+            reasoning_output: The output of the reasoning chain.
+
+        Returns:
+            The response chain instance for the query.
+        """
+        if self.is_cacheable(intent, reasoning_output):
+            return self.chain_map[intent]["cacheable_response"]
+        return self.chain_map[intent]["response"]
+
+    def is_cacheable(self, intent: str, reasoning_output: Dict) -> bool:
+        """Whether the answer to a query only depends on the query and its products."""
+        return intent in self.cacheable_intents and bool(
+            reasoning_output.get("product_info")
+        )
+
     def get_agent(self, intent: str):
         """Retrieve the agent based on user intent.
 
@@ -125,78 +271,405 @@ class MainChatbot:
         Returns:
             The classified intent of the user input.
         """
-        # Retrieve possible routes for the user's input using the classifier
-        intent_routes = self.intention_classifier.retrieve_multiple_routes(
-            user_input["customer_input"]
+        # Classify the input with the same vectorized path used for batches
+        return self.classify_batch([user_input["customer_input"]])[0]
+
+    def classify_batch(self, messages: List[str]) -> List[Optional[str]]:
+        """Classify many user messages with a single encoder call.
+
+        Args:
+            messages: The input texts from the users.
+
+        Returns:
+            The classified intent of each message, or None when no intent matches.
+        """
+        if not messages:
+            return []
+
+        vectors = self._encode_messages(messages)
+        return self.intention_classifier.classify_vectors(vectors)
+
+    def rank_user_intent(
+        self, user_input: Dict
+    ) -> Tuple[Optional[str], List[Tuple[str, float]]]:
+        """Classify the user intent and rank the two best candidate intents.
+
+        Args:
+            user_input: The input text from the user.
+
+        Returns:
+            The classified intent, or None, and the (intent, score) candidates.
+        """
+        vectors = self._encode_messages([user_input["customer_input"]])
+        intentions, candidates = self.intention_classifier.classify_and_rank_vectors(
+            vectors, k=2
         )
+        return intentions[0], candidates[0]
 
-        # Handle cases where no intent is identified
-        if len(intent_routes) == 0:
-            return None
-        else:
-            intention = intent_routes[0].name  # Use the first matched intent
+    def _encode_messages(self, messages: List[str]) -> np.ndarray:
+        """Encode messages with the router, remembering their embeddings."""
+        vectors = self.intention_classifier.encode(messages)
 
-        # Validate the retrieved intention and handle unexpected types
-        if intention is None:
-            return None
-        elif isinstance(intention, str):
-            return intention
-        else:
-            # Log the intention type for unexpected cases
-            intention_type = type(intention).__name__
-            print(
-                f"I'm sorry, I didn't understand that. The intention type is {intention_type}."
+        # Keep the embeddings so later stages do not encode the messages again
+        with self._embeddings_lock:
+            for message, vector in zip(messages, vectors):
+                self.query_embeddings[message] = vector
+                self.query_embeddings.move_to_end(message)
+            while len(self.query_embeddings) > 256:
+                self.query_embeddings.popitem(last=False)
+
+        return vectors
+
+    def get_query_embedding(self, message: str) -> np.ndarray:
+        """Return the router embedding of a message, encoding it if it is not known.
+
+        Args:
+            message: The input text from the user.
+
+        Returns:
+            The normalized embedding of the message.
+        """
+        with self._embeddings_lock:
+            vector = self.query_embeddings.get(message)
+        if vector is None:
+            vector = self.intention_classifier.encode([message])[0]
+        return vector
+
+    def get_cached_response(
+        self, intent: str, reasoning_output: Dict, session: SessionContext
+    ) -> Optional[str]:
+        """Serve the response of a near-duplicate past query, if any.
+
+        A hit is recorded in the session history, as if the chains had run.
+
+        Args:
+            intent: The intent of the query.
+            reasoning_output: The output of the reasoning chain.
+            session: The session of the turn.
+
+        Returns:
+            The cached response, or None on a miss.
+        """
+        if not self.is_cacheable(intent, reasoning_output):
+            return None  # The answer may depend on the conversation
+
+        response = self.response_cache.lookup(
+            self.get_query_embedding(reasoning_output["customer_input"]),
+            self._response_cache_key(intent, reasoning_output),
+        )
+        if response is not None:
+            self._add_exchange(reasoning_output["customer_input"], response, session)
+        return response
+
+    def cache_response(
+        self,
+        intent: str,
+        reasoning_output: Dict,
+        response: str,
+        session: SessionContext,
+    ):
+        """Cache the response of a query for near-duplicate queries.
+
+        Cacheable responses are generated without the session history, so the
+        exchange is recorded in the session history here.
+
+        Args:
+            intent: The intent of the query.
+            reasoning_output: The output of the reasoning chain.
+            response: The final response to the query.
+            session: The session of the turn.
+        """
+        if self.is_cacheable(intent, reasoning_output):
+            self.response_cache.add(
+                self.get_query_embedding(reasoning_output["customer_input"]),
+                self._response_cache_key(intent, reasoning_output),
+                response,
             )
-            return None
+            self._add_exchange(reasoning_output["customer_input"], response, session)
+
+    @staticmethod
+    def _response_cache_key(intent: str, reasoning_output: Dict) -> Tuple:
+        """Key of a cached response, shared by every conversation."""
+        return (intent, reasoning_output["product_info"])
+
+    def _add_exchange(self, query: str, response: str, session: SessionContext):
+        """Record a query and its response in the session history."""
+        self.memory.get_session_history(
+            session.user_id, session.conversation_id
+        ).add_messages([HumanMessage(content=query), AIMessage(content=response)])
+
+    async def aget_user_intent(self, user_input: Dict) -> Optional[str]:
+        """Classify the user intent without blocking the event loop.
+
+        The encoder forward pass is CPU-bound, so it runs in a worker thread.
+
+        Args:
+            user_input: The input text from the user.
+
+        Returns:
+            The classified intent of the user input.
+        """
+        return await asyncio.to_thread(self.get_user_intent, user_input)
+
+    async def aclassify_batch(self, messages: List[str]) -> List[Optional[str]]:
+        """Classify many user messages in a worker thread.
+
+        Args:
+            messages: The input texts from the users.
+
+        Returns:
+            The classified intent of each message, or None when no intent matches.
+        """
+        return await asyncio.to_thread(self.classify_batch, messages)
 
-    def handle_product_information(self, user_input: Dict):
+    def handle_product_information(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ):
         """Handle the product information intent by processing user input and providing a response.
 
         Args:
             user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
 
         Returns:
             The content of the response after processing through the chains.
         """
         # Retrieve reasoning and response chains for the product information intent
-        reasoning_chain, response_chain = self.get_chain("product_information")
+        reasoning_chain, _ = self.get_chain("product_information")
 
         # Process user input through the reasoning chain
         reasoning_output = reasoning_chain.invoke(user_input)
 
+        # Serve near-duplicate questions about the same products from the cache
+        session = self.get_session(session)
+        cached = self.get_cached_response(
+            "product_information", reasoning_output, session
+        )
+        if cached is not None:
+            return cached
+
+        # Generate a response using the output of the reasoning chain
+        response_chain = self.get_response_chain(
+            "product_information", reasoning_output
+        )
+        response = response_chain.invoke(reasoning_output, config=session.memory_config)
+
+        self.cache_response(
+            "product_information", reasoning_output, response.content, session
+        )
+        return response.content
+
+    async def ahandle_product_information(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> str:
+        """Asynchronously handle the product information intent.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Returns:
+            The content of the response after processing through the chains.
+        """
+        # Retrieve reasoning and response chains for the product information intent
+        reasoning_chain, _ = self.get_chain("product_information")
+
+        # Process user input through the reasoning chain
+        # Reuse the reasoning started speculatively, if any
+        reasoning_output = await self.speculator.take("product_information")
+        if reasoning_output is None:
+            reasoning_output = await reasoning_chain.ainvoke(user_input)
+
+        # Serve near-duplicate questions about the same products from the cache
+        session = self.get_session(session)
+        cached = self.get_cached_response(
+            "product_information", reasoning_output, session
+        )
+        if cached is not None:
+            return cached
+
         # Generate a response using the output of the reasoning chain
-        response = response_chain.invoke(reasoning_output, config=self.memory_config)
+        response_chain = self.get_response_chain(
+            "product_information", reasoning_output
+        )
+        response = await response_chain.ainvoke(
+            reasoning_output, config=session.memory_config
+        )
 
+        self.cache_response(
+            "product_information", reasoning_output, response.content, session
+        )
         return response.content
 
-    def handle_order_intent(self, user_input: Dict):
+    def handle_order_intent(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ):
         """Handle the order intent by processing user input and providing a response.
 
         Args:
             user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
 
         Returns:
             The content of the response after processing through the chains.
         """
+        session = self.get_session(session)
+
         # Retrieve the agent for the order intent
         agent = self.get_agent("order")
 
         # Process user input through the agent
-        response = agent.invoke(
-            {
-                "customer_id": self.user_id,
-                "customer_input": user_input["customer_input"],
-            },
-            config=self.memory_config,
-        )
+        with get_metrics().timer("order_agent"):
+            response = agent.invoke(
+                {
+                    "customer_id": session.user_id,
+                    "customer_input": user_input["customer_input"],
+                },
+                config=session.memory_config,
+            )
+
+        return response["output"]
+
+    async def ahandle_order_intent(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> str:
+        """Asynchronously handle the order intent.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Returns:
+            The content of the response after processing through the agent.
+        """
+        session = self.get_session(session)
+
+        # Retrieve the agent for the order intent
+        agent = self.get_agent("order")
+
+        # Process user input through the agent
+        with get_metrics().timer("order_agent"):
+            response = await agent.ainvoke(
+                {
+                    "customer_id": session.user_id,
+                    "customer_input": user_input["customer_input"],
+                },
+                config=session.memory_config,
+            )
 
         return response["output"]
 
-    def handle_unknown_intent(self, user_input: Dict[str, str]) -> str:
+    def _order_status_input(self, user_input: Dict, session: SessionContext) -> Dict:
+        """Build the input of the order status chains for the customer of a session."""
+        return {
+            "customer_input": user_input["customer_input"],
+            "customer_id": session.user_id,
+        }
+
+    def handle_order_status(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> str:
+        """Handle the order status intent with a database lookup and one response.
+
+        The order number is extracted locally when possible, and the orders are
+        read directly instead of through the order agent.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Returns:
+            The content of the response after processing through the chains.
+        """
+        session = self.get_session(session)
+        reasoning_chain, response_chain = self.get_chain("order_status")
+
+        # Look up the orders the query refers to
+        reasoning_output = reasoning_chain.invoke(
+            self._order_status_input(user_input, session)
+        )
+
+        # Generate a response using the order information
+        response = response_chain.invoke(reasoning_output, config=session.memory_config)
+        return response.content
+
+    async def ahandle_order_status(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> str:
+        """Asynchronously handle the order status intent.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Returns:
+            The content of the response after processing through the chains.
+        """
+        session = self.get_session(session)
+        reasoning_chain, response_chain = self.get_chain("order_status")
+
+        # Look up the orders the query refers to
+        reasoning_output = await reasoning_chain.ainvoke(
+            self._order_status_input(user_input, session)
+        )
+
+        # Generate a response using the order information
+        response = await response_chain.ainvoke(
+            reasoning_output, config=session.memory_config
+        )
+        return response.content
+
+    def handle_support_information(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> str:
+        """Handle the support information intent through the RAG chain.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Returns:
+            The content of the response generated from the retrieved documents.
+        """
+        with get_metrics().timer("rag"):
+            response = self.rag.invoke(
+                user_input, config=self.get_session(session).memory_config
+            )
+        return self._get_content(response)
+
+    async def ahandle_support_information(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> str:
+        """Asynchronously handle the support information intent.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Returns:
+            The content of the response generated from the retrieved documents.
+        """
+        with get_metrics().timer("rag"):
+            response = await self.rag.ainvoke(
+                user_input, config=self.get_session(session).memory_config
+            )
+        return self._get_content(response)
+
+    @staticmethod
+    def _get_content(response) -> str:
+        """Extract the text of a chain output, either a message or a dictionary."""
+        if isinstance(response, dict):
+            return response["output"]
+        return getattr(response, "content", response)
+
+    def handle_unknown_intent(
+        self, user_input: Dict[str, str], session: Optional[SessionContext] = None
+    ) -> str:
         """Handle unknown intents by providing a chitchat response.
 
         Args:
             user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
 
         Returns:
             The content of the response after processing through the new chain.
@@ -209,6 +682,8 @@ class MainChatbot:
             "Chitchat",
         ]
 
+        session = self.get_session(session)
+
         chitchat_reasoning_chain, _ = self.get_chain("chitchat")
 
         input_message = {}
@@ -216,40 +691,522 @@ class MainChatbot:
         input_message["customer_input"] = user_input["customer_input"]
         input_message["possible_intentions"] = possible_intention
         input_message["chat_history"] = self.memory.get_session_history(
-            self.user_id, self.conversation_id
+            session.user_id, session.conversation_id
         )
 
         reasoning_output1 = chitchat_reasoning_chain.invoke(input_message)
 
         if reasoning_output1.chitchat:
             print("Chitchat")
-            return self.handle_chitchat_intent(user_input)
+            return self.handle_chitchat_intent(user_input, session)
         else:
             router_reasoning_chain2, _ = self.get_chain("router")
             reasoning_output2 = router_reasoning_chain2.invoke(input_message)
             new_intention = reasoning_output2.intent
             print("New Intention:", new_intention)
             new_handler = self.intent_handlers.get(new_intention)
-            return new_handler(user_input)
+            return new_handler(user_input, session)
+
+    async def ahandle_unknown_intent(
+        self, user_input: Dict[str, str], session: Optional[SessionContext] = None
+    ) -> str:
+        """Asynchronously handle unknown intents by providing a chitchat response.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Returns:
+            The content of the response after processing through the new chain.
+        """
+        possible_intention = [
+            "Product Information",
+            "Create Order",
+            "Order Status",
+            "Support Information",
+            "Chitchat",
+        ]
 
-    def save_memory(self) -> None:
-        """Save the current memory state of the bot."""
-        self.memory.save_session_history(self.user_id, self.conversation_id)
+        session = self.get_session(session)
+
+        chitchat_reasoning_chain, _ = self.get_chain("chitchat")
+
+        input_message = {}
+
+        input_message["customer_input"] = user_input["customer_input"]
+        input_message["possible_intentions"] = possible_intention
+        input_message["chat_history"] = self.memory.get_session_history(
+            session.user_id, session.conversation_id
+        )
+
+        reasoning_output1 = await chitchat_reasoning_chain.ainvoke(input_message)
+
+        if reasoning_output1.chitchat:
+            print("Chitchat")
+            return await asyncio.to_thread(
+                self.handle_chitchat_intent, user_input, session
+            )
+        else:
+            router_reasoning_chain2, _ = self.get_chain("router")
+            reasoning_output2 = await router_reasoning_chain2.ainvoke(input_message)
+            new_intention = reasoning_output2.intent
+            print("New Intention:", new_intention)
+            new_handler = self.async_intent_handlers.get(new_intention)
+            return await new_handler(user_input, session)
+
+    def save_memory(self, session: Optional[SessionContext] = None) -> None:
+        """Save the memory state of a session.
+
+        Args:
+            session: The session to save, the logged in session by default.
+        """
+        session = self.get_session(session)
+        self.memory.save_session_history(session.user_id, session.conversation_id)
 
-    def process_user_input(self, user_input: Dict[str, str]) -> str:
+    def process_user_input(
+        self, user_input: Dict[str, str], session: Optional[SessionContext] = None
+    ) -> str:
         """Process user input by routing through the appropriate intention pipeline.
 
         Args:
             user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
 
         Returns:
             The content of the response after processing through the chains.
         """
-        # Classify the user's intent based on their input
-        intention = self.get_user_intent(user_input)
+        session = self.get_session(session)
+
+        # Keep the session in memory until its messages are added
+        with get_metrics().turn(), self.memory.pin_session(
+            session.user_id, session.conversation_id
+        ):
+            # Classify the user's intent based on their input
+            intention = self.get_user_intent(user_input)
+
+            print("Intent:", intention)
+            get_metrics().annotate(intent=intention)
+
+            # Route the input based on the identified intention
+            handler = self.intent_handlers.get(intention, self.handle_unknown_intent)
+            return handler(user_input, session)
+
+    async def aprocess_user_input(
+        self, user_input: Dict[str, str], session: Optional[SessionContext] = None
+    ) -> str:
+        """Asynchronously process user input through the appropriate intention pipeline.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Returns:
+            The content of the response after processing through the chains.
+        """
+        session = self.get_session(session)
+
+        # Keep the session in memory until its messages are added
+        with get_metrics().turn(), self.memory.pin_session(
+            session.user_id, session.conversation_id
+        ):
+            if self.speculative:
+                return await self._aprocess_speculatively(user_input, session)
+
+            # Classify the user's intent in a worker thread
+            intention = await self.aget_user_intent(user_input)
+
+            print("Intent:", intention)
+            get_metrics().annotate(intent=intention)
+
+            # Route the input based on the identified intention
+            handler = self.async_intent_handlers.get(
+                intention, self.ahandle_unknown_intent
+            )
+            return await handler(user_input, session)
+
+    async def _speculate_product_information(self, user_input: Dict) -> Dict:
+        """Run the product reasoning chain on a copy of the user input."""
+        reasoning_chain, _ = self.get_chain("product_information")
+        return await reasoning_chain.ainvoke(dict(user_input))
+
+    async def _aprocess_speculatively(
+        self, user_input: Dict[str, str], session: Optional[SessionContext] = None
+    ) -> str:
+        """Process user input while side-effect-free stages run ahead of routing.
+
+        The product reasoning starts together with intent classification. When no
+        route matches, the intent is decided by the LLM fallback, so the stages of
+        the best candidate intents (both of them if their margin is low) keep
+        running meanwhile. Stages the final intent does not use are cancelled and
+        reported in `speculator.stats`.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Returns:
+            The content of the response after processing through the chains.
+        """
+        session = self.get_session(session)
+        token = self.speculator.begin()
+
+        try:
+            self.speculator.launch(
+                "product_information", self._speculate_product_information(user_input)
+            )
+
+            # Classify the user's intent in a worker thread
+            intention, candidates = await asyncio.to_thread(
+                self.rank_user_intent, user_input
+            )
+
+            print("Intent:", intention)
+            get_metrics().annotate(intent=intention)
+
+            if intention is not None:
+                # The intent is final, drop the work of the other intents
+                self.speculator.prune(keep=[intention])
+            else:
+                low_margin = (
+                    len(candidates) > 1
+                    and candidates[0][1] - candidates[1][1] < self.speculation_margin
+                )
+                likely = [name for name, _ in candidates[: 2 if low_margin else 1]]
+                for name in likely:
+                    if name in self.speculative_stages:
+                        self.speculator.launch(
+                            name, self.speculative_stages[name](user_input)
+                        )
+                self.speculator.prune(keep=likely)
+
+            # Route the input based on the identified intention
+            handler = self.async_intent_handlers.get(
+                intention, self.ahandle_unknown_intent
+            )
+            return await handler(user_input, session)
+        finally:
+            self.speculator.end(token)
+
+    @staticmethod
+    def _get_chunk_text(chunk) -> str:
+        """Extract the text of a streamed chunk, either a message or a dictionary."""
+        if isinstance(chunk, dict):
+            return chunk.get("output", "")
+        return getattr(chunk, "content", chunk) or ""
+
+    def stream_product_information(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> Iterator[str]:
+        """Stream the response to a product information query.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The tokens of the response as they are generated.
+        """
+        reasoning_chain, _ = self.get_chain("product_information")
+        reasoning_output = reasoning_chain.invoke(user_input)
+
+        session = self.get_session(session)
+        cached = self.get_cached_response(
+            "product_information", reasoning_output, session
+        )
+        if cached is not None:
+            yield cached
+            return
+
+        # The history wrapper, or `cache_response` for history-free answers,
+        # commits the full message once the stream ends
+        response_chain = self.get_response_chain(
+            "product_information", reasoning_output
+        )
+        chunks = []
+        for chunk in response_chain.stream(
+            reasoning_output, config=session.memory_config
+        ):
+            text = self._get_chunk_text(chunk)
+            if text:
+                chunks.append(text)
+                yield text
+
+        self.cache_response(
+            "product_information", reasoning_output, "".join(chunks), session
+        )
+
+    async def astream_product_information(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> AsyncIterator[str]:
+        """Asynchronously stream the response to a product information query.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The tokens of the response as they are generated.
+        """
+        reasoning_chain, _ = self.get_chain("product_information")
+        # Reuse the reasoning started speculatively, if any
+        reasoning_output = await self.speculator.take("product_information")
+        if reasoning_output is None:
+            reasoning_output = await reasoning_chain.ainvoke(user_input)
+
+        session = self.get_session(session)
+        cached = self.get_cached_response(
+            "product_information", reasoning_output, session
+        )
+        if cached is not None:
+            yield cached
+            return
+
+        # The history wrapper, or `cache_response` for history-free answers,
+        # commits the full message once the stream ends
+        response_chain = self.get_response_chain(
+            "product_information", reasoning_output
+        )
+        chunks = []
+        async for chunk in response_chain.astream(
+            reasoning_output, config=session.memory_config
+        ):
+            text = self._get_chunk_text(chunk)
+            if text:
+                chunks.append(text)
+                yield text
+
+        self.cache_response(
+            "product_information", reasoning_output, "".join(chunks), session
+        )
+
+    def stream_order_intent(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> Iterator[str]:
+        """Stream the response of the order agent.
+
+        The synchronous agent stream is made of steps, so the final answer is
+        yielded in one piece; use `astream_order_intent` for token streaming.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The final answer of the agent.
+        """
+        session = self.get_session(session)
+
+        for chunk in self.get_agent("order").stream(
+            {
+                "customer_id": session.user_id,
+                "customer_input": user_input["customer_input"],
+            },
+            config=session.memory_config,
+        ):
+            if chunk.get("output"):
+                yield chunk["output"]
+
+    async def astream_order_intent(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> AsyncIterator[str]:
+        """Asynchronously stream the response of the order agent token by token.
+
+        Only the model calls of the agent itself that answer in text are
+        forwarded: calls made inside a tool are skipped, and so is every call
+        whose output starts with a tool call, i.e. the intermediate steps.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The tokens of the final answer as they are generated.
+        """
+        session = self.get_session(session)
+
+        tool_runs = set()  # Runs of the tools called by the agent
+        answers: Dict[str, bool] = {}  # Whether each model call answers in text
+
+        async for event in self.get_agent("order").astream_events(
+            {
+                "customer_id": session.user_id,
+                "customer_input": user_input["customer_input"],
+            },
+            config=session.memory_config,
+            version="v2",
+        ):
+            if event["event"] == "on_tool_start":
+                tool_runs.add(event["run_id"])
+                continue
+            if event["event"] != "on_chat_model_stream":
+                continue
+            if tool_runs.intersection(event.get("parent_ids", ())):
+                continue  # A model call made by a tool, not by the agent
+
+            # The first chunk with content tells a tool call from the answer
+            run_id, chunk = event["run_id"], event["data"]["chunk"]
+            text = self._get_chunk_text(chunk)
+            if run_id not in answers:
+                if getattr(chunk, "tool_call_chunks", None):
+                    answers[run_id] = False
+                elif text:
+                    answers[run_id] = True
+
+            if text and answers.get(run_id):
+                yield text
+
+    def stream_order_status(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> Iterator[str]:
+        """Stream the response to an order status query.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The tokens of the response as they are generated.
+        """
+        session = self.get_session(session)
+        reasoning_chain, response_chain = self.get_chain("order_status")
+        reasoning_output = reasoning_chain.invoke(
+            self._order_status_input(user_input, session)
+        )
+
+        # The history wrapper commits the full message once the stream ends
+        for chunk in response_chain.stream(
+            reasoning_output, config=session.memory_config
+        ):
+            text = self._get_chunk_text(chunk)
+            if text:
+                yield text
+
+    async def astream_order_status(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> AsyncIterator[str]:
+        """Asynchronously stream the response to an order status query.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The tokens of the response as they are generated.
+        """
+        session = self.get_session(session)
+        reasoning_chain, response_chain = self.get_chain("order_status")
+        reasoning_output = await reasoning_chain.ainvoke(
+            self._order_status_input(user_input, session)
+        )
+
+        # The history wrapper commits the full message once the stream ends
+        async for chunk in response_chain.astream(
+            reasoning_output, config=session.memory_config
+        ):
+            text = self._get_chunk_text(chunk)
+            if text:
+                yield text
+
+    def stream_support_information(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> Iterator[str]:
+        """Stream the response of the RAG chain.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The tokens of the response as they are generated.
+        """
+        for chunk in self.rag.stream(
+            user_input, config=self.get_session(session).memory_config
+        ):
+            text = self._get_chunk_text(chunk)
+            if text:
+                yield text
+
+    async def astream_support_information(
+        self, user_input: Dict, session: Optional[SessionContext] = None
+    ) -> AsyncIterator[str]:
+        """Asynchronously stream the response of the RAG chain.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The tokens of the response as they are generated.
+        """
+        async for chunk in self.rag.astream(
+            user_input, config=self.get_session(session).memory_config
+        ):
+            text = self._get_chunk_text(chunk)
+            if text:
+                yield text
+
+    def stream_user_input(
+        self, user_input: Dict[str, str], session: Optional[SessionContext] = None
+    ) -> Iterator[str]:
+        """Process user input like `process_user_input`, yielding the response tokens.
+
+        The full response is committed to the session history when the stream ends.
+        Unknown intents go through their regular handler and are yielded in one piece.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The tokens of the response as they are generated.
+        """
+        session = self.get_session(session)
+
+        # Keep the session in memory until the full response is committed
+        with get_metrics().turn(), self.memory.pin_session(
+            session.user_id, session.conversation_id
+        ):
+            # Classify the user's intent based on their input
+            intention = self.get_user_intent(user_input)
+
+            print("Intent:", intention)
+            get_metrics().annotate(intent=intention)
+
+            handler = self.stream_intent_handlers.get(intention)
+            if handler is None:
+                yield self.handle_unknown_intent(user_input, session)
+                return
+
+            yield from handler(user_input, session)
+
+    async def astream_user_input(
+        self, user_input: Dict[str, str], session: Optional[SessionContext] = None
+    ) -> AsyncIterator[str]:
+        """Asynchronously process user input, yielding the response tokens.
+
+        Args:
+            user_input: The input text from the user.
+            session: The session of the turn, the logged in session by default.
+
+        Yields:
+            The tokens of the response as they are generated.
+        """
+        session = self.get_session(session)
+
+        # Keep the session in memory until the full response is committed
+        with get_metrics().turn(), self.memory.pin_session(
+            session.user_id, session.conversation_id
+        ):
+            # Classify the user's intent in a worker thread
+            intention = await self.aget_user_intent(user_input)
+
+            print("Intent:", intention)
+            get_metrics().annotate(intent=intention)
 
-        print("Intent:", intention)
+            handler = self.async_stream_intent_handlers.get(intention)
+            if handler is None:
+                yield await self.ahandle_unknown_intent(user_input, session)
+                return
 
-        # Route the input based on the identified intention
-        handler = self.intent_handlers.get(intention, self.handle_unknown_intent)
-        return handler(user_input)
+            async for token in handler(user_input, session):
+                yield token
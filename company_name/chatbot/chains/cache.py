@@ -0,0 +1,236 @@
+# Import necessary modules and classes
+import atexit
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+# Default location and size of the extraction cache
+CACHE_PATH = "extraction_cache.db"
+MAX_ENTRIES = 10000
+
+# Number of cache hits whose use time is kept in memory before being written
+TOUCH_BATCH = 100
+
+
+def normalize_input(text: str) -> str:
+    """Normalize a customer query so trivially different phrasings share an entry.
+
+    Args:
+        text: The customer query.
+
+    Returns:
+        The query lowercased, with collapsed whitespace and no trailing punctuation.
+    """
+    return re.sub(r"\s+", " ", text.lower()).strip().rstrip("?!. ")
+
+
+def prompt_version(prompt, llm, **variables) -> str:
+    """Compute the version of an extraction prompt.
+
+    The version covers the prompt messages, the model and every static variable
+    (product lists, format instructions), so editing the prompt or the catalog
+    automatically invalidates the outputs cached with the previous version.
+
+    Args:
+        prompt: The chat prompt template of the chain.
+        llm: The language model of the chain.
+        **variables: The static variables formatted into the prompt.
+
+    Returns:
+        A short hex digest identifying the prompt version.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(prompt.messages).encode("utf-8"))
+    digest.update(str(getattr(llm, "model_name", type(llm).__name__)).encode("utf-8"))
+    for name in sorted(variables):
+        digest.update(f"{name}={variables[name]}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class ExtractionCache:
+    """Persistent cache of the parsed outputs of structured-extraction chains.
+
+    The extraction chains run at temperature 0 and their output depends only on
+    the customer query and static prompt variables, so outputs are stored in a
+    SQLite table keyed by chain name, prompt version and normalized query. The
+    least recently used entries are evicted beyond `max_entries`.
+
+    Hits only record their use time in memory, and the recorded times are written
+    in batches, before each insert and when the process exits, so a hit does not
+    commit a transaction.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        """Initialize the cache.
+
+        Args:
+            path: Path of the SQLite database storing the cached outputs.
+            max_entries: Maximum number of cached outputs.
+        """
+        self.path = path
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # Commits only append to the write-ahead log, without syncing it each time
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS extractions
+               (chain TEXT,
+                version TEXT,
+                input TEXT,
+                output TEXT,
+                last_used REAL,
+                PRIMARY KEY (chain, version, input))""")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions (last_used)"
+        )
+        self._size = self._connection.execute(
+            "SELECT COUNT(*) FROM extractions"
+        ).fetchone()[0]
+
+        # Use times of the hits not written yet, by key
+        self._touched: Dict[Tuple[str, str, str], float] = {}
+        atexit.register(self.flush)
+
+        # Counters exposed through `stats`
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(
+        self, chain: str, version: str, text: str, model: Type[BaseModel]
+    ) -> Optional[BaseModel]:
+        """Look up the cached output of a chain for a query.
+
+        Args:
+            chain: Name of the chain.
+            version: Version of the chain prompt, see `prompt_version`.
+            text: The customer query.
+            model: The Pydantic model of the chain output.
+
+        Returns:
+            The cached output, or None on a miss.
+        """
+        key = (chain, version, normalize_input(text))
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT output FROM extractions WHERE chain = ? AND version = ? AND input = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                with self._connection:
+                    self._write_touched()
+
+        return model.model_validate_json(row[0])
+
+    def set(self, chain: str, version: str, text: str, output: BaseModel) -> None:
+        """Store the output of a chain for a query.
+
+        Args:
+            chain: Name of the chain.
+            version: Version of the chain prompt, see `prompt_version`.
+            text: The customer query.
+            output: The parsed output of the chain.
+        """
+        key = (chain, version, normalize_input(text))
+
+        with self._lock, self._connection:
+            # Evict on up-to-date use times
+            self._write_touched()
+
+            cursor = self._connection.execute(
+                "UPDATE extractions SET output = ?, last_used = ? WHERE chain = ? AND version = ? AND input = ?",
+                (output.model_dump_json(), time.time(), *key),
+            )
+            if cursor.rowcount == 0:
+                self._connection.execute(
+                    "INSERT INTO extractions VALUES (?, ?, ?, ?, ?)",
+                    (*key, output.model_dump_json(), time.time()),
+                )
+                self._size += 1
+
+            # Evict the least recently used entries beyond the size bound
+            if self._size > self.max_entries:
+                excess = self._size - self.max_entries
+                self._connection.execute(
+                    """DELETE FROM extractions WHERE rowid IN
+                       (SELECT rowid FROM extractions ORDER BY last_used LIMIT ?)""",
+                    (excess,),
+                )
+                self._size -= excess
+                self.evictions += excess
+
+    def invalidate(self, chain: Optional[str] = None) -> None:
+        """Drop the cached outputs of a chain, or of every chain.
+
+        Args:
+            chain: Name of the chain to invalidate, all chains if None.
+        """
+        with self._lock, self._connection:
+            if chain is None:
+                self._connection.execute("DELETE FROM extractions")
+                self._touched.clear()
+                self._size = 0
+            else:
+                cursor = self._connection.execute(
+                    "DELETE FROM extractions WHERE chain = ?", (chain,)
+                )
+                self._touched = {
+                    key: used for key, used in self._touched.items() if key[0] != chain
+                }
+                self._size -= cursor.rowcount
+
+    def flush(self) -> None:
+        """Write the use times of the hits recorded in memory."""
+        with self._lock, self._connection:
+            self._write_touched()
+
+    def _write_touched(self) -> None:
+        """Write the recorded use times, the caller holding the lock and a transaction."""
+        if not self._touched:
+            return
+        self._connection.executemany(
+            "UPDATE extractions SET last_used = ? WHERE chain = ? AND version = ? AND input = ?",
+            [(used, *key) for key, used in self._touched.items()],
+        )
+        self._touched.clear()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Hit, miss and eviction counters, with the hit rate and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": self._size,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_extraction_cache(path: str = CACHE_PATH) -> ExtractionCache:
+    """
+    Return the extraction cache stored at a path, shared by the whole process.
+
+    Args:
+        path (str): Path of the SQLite database storing the cached outputs.
+
+    Returns:
+        The shared ExtractionCache instance.
+    """
+    return ExtractionCache(path)
@@ -1,12 +1,10 @@
-import ast
-import re
-
 from langchain.output_parsers import PydanticOutputParser
 from langchain.schema.runnable.base import Runnable
-from langchain_community.utilities.sql_database import SQLDatabase
 from pydantic import BaseModel
 
 from company_name.chatbot.chains.base import PromptTemplate, generate_prompt_templates
+from company_name.chatbot.chains.cache import get_extraction_cache, prompt_version
+from company_name.data.database import get_database
 
 
 class OrderInformation(BaseModel):
@@ -15,13 +13,14 @@ class OrderInformation(BaseModel):
 
 
 class Chain1(Runnable):
-    def __init__(self, llm, db_path, memory=False):
+    def __init__(self, llm, db_path=None, memory=False, cache=True):
         super().__init__()
 
         self.llm = llm
 
-        self.db = SQLDatabase.from_uri(f"sqlite:///{db_path}")
-        self.products_list = self.query_as_list("SELECT Name FROM products")
+        # Shared read-only access layer; the product names are cached across chains
+        self.db = get_database(db_path)
+        self.products_list = self.db.get_product_names()
 
         prompt_template = PromptTemplate(
             system_template=""" 
@@ -45,17 +44,47 @@ class Chain1(Runnable):
 
         self.chain = self.prompt | self.llm | self.output_parser
 
-    def query_as_list(self, query):
-        res = self.db.run(query)
-        res = [el for sub in ast.literal_eval(res) for el in sub if el]
-        res = [re.sub(r"\b\d+\b", "", string).strip() for string in res]
-        return list(set(res))
+        # Persistent cache of extractions, unless the output depends on the history
+        self.cache = get_extraction_cache() if cache and not memory else None
+        self.prompt_version = prompt_version(
+            self.prompt,
+            self.llm,
+            products_list=self.products_list,
+            format_instructions=self.format_instructions,
+        )
+
+    def query_as_list(self, query, params=()):
+        return [
+            value
+            for row in self.db.cached_query(query, params)
+            for value in row
+            if value
+        ]
 
     def invoke(self, inputs):
-        return self.chain.invoke(
+        if self.cache is not None:
+            cached = self.cache.get(
+                self.__class__.__name__,
+                self.prompt_version,
+                inputs["customer_input"],
+                OrderInformation,
+            )
+            if cached is not None:
+                return cached
+
+        response = self.chain.invoke(
             {
                 "customer_input": inputs["customer_input"],
                 "products_list": self.products_list,
                 "format_instructions": self.format_instructions,
             },
         )
+
+        if self.cache is not None:
+            self.cache.set(
+                self.__class__.__name__,
+                self.prompt_version,
+                inputs["customer_input"],
+                response,
+            )
+        return response
@@ -3,6 +3,7 @@ from langchain.schema.runnable.base import Runnable
 from pydantic import BaseModel
 
 from company_name.chatbot.chains.base import PromptTemplate, generate_prompt_templates
+from company_name.chatbot.chains.cache import get_extraction_cache, prompt_version
 
 
 class OrderId(BaseModel):
@@ -10,7 +11,7 @@ class OrderId(BaseModel):
 
 
 class Chain2(Runnable):
-    def __init__(self, llm, memory=False):
+    def __init__(self, llm, memory=False, cache=True):
         super().__init__()
 
         self.llm = llm
@@ -33,10 +34,37 @@ class Chain2(Runnable):
 
         self.chain = self.prompt | self.llm | self.output_parser
 
+        # Persistent cache of extractions, unless the output depends on the history
+        self.cache = get_extraction_cache() if cache and not memory else None
+        self.prompt_version = prompt_version(
+            self.prompt,
+            self.llm,
+            format_instructions=self.format_instructions,
+        )
+
     def invoke(self, inputs):
-        return self.chain.invoke(
+        if self.cache is not None:
+            cached = self.cache.get(
+                self.__class__.__name__,
+                self.prompt_version,
+                inputs["customer_input"],
+                OrderId,
+            )
+            if cached is not None:
+                return cached
+
+        response = self.chain.invoke(
             {
                 "customer_input": inputs["customer_input"],
                 "format_instructions": self.format_instructions,
             },
         )
+
+        if self.cache is not None:
+            self.cache.set(
+                self.__class__.__name__,
+                self.prompt_version,
+                inputs["customer_input"],
+                response,
+            )
+        return response
@@ -1,14 +1,15 @@
 # Import necessary libraries and modules
-import json
 from typing import List, Optional
 
-from langchain import callbacks
 from langchain.output_parsers import PydanticOutputParser
 from langchain.schema.runnable.base import Runnable
 from pydantic import BaseModel, Field
 
 from company_name.chatbot.chains.base import PromptTemplate, generate_prompt_templates
-from company_name.data.loader import load_database_file
+from company_name.chatbot.chains.cache import get_extraction_cache, prompt_version
+from company_name.chatbot.metrics import get_metrics
+from company_name.data.catalog import get_product_catalog
+from company_name.data.matcher import ProductMentionMatcher, ProductMentions
 
 # Define the product database as a dictionary with product categories
 PRODUCT_DATABASE = {
@@ -77,13 +78,32 @@ class ProductQueryResult(BaseModel):
 class ReasoningChain3(Runnable):
     """Chain that processes product information reasoning from a customer query."""
 
-    def __init__(self, llm, memory=False):
-        """Initialize the product info reasoning chain."""
+    def __init__(self, llm, memory=False, fast_path=True, cache=True):
+        """Initialize the product info reasoning chain.
+
+        Args:
+            llm: The language model used to identify the mentioned products.
+            memory: Whether the prompt includes the conversation history.
+            fast_path: Whether to match product and category names locally first,
+                calling the language model only when the match fails or is ambiguous.
+            cache: Whether to reuse the extractions of previously seen queries.
+                Ignored with memory, as the output then depends on the history.
+        """
         super().__init__()
         self.product_database = PRODUCT_DATABASE
         self.categories, self.products = self._format_product_database()
         self.llm = llm
-        self.products_catalog = load_database_file("products_catalog.pkl")
+
+        # Shared catalog, indexed once per process for exact and fuzzy lookups
+        self.catalog = get_product_catalog("products_catalog.pkl")
+        self.products_catalog = self.catalog.products
+
+        # Local matcher of product and category mentions, skipping the LLM on a hit
+        self.matcher = (
+            ProductMentionMatcher(self.catalog, self.product_database.keys())
+            if fast_path
+            else None
+        )
 
         # Define the prompt template for product identification
         prompt_template = PromptTemplate(
@@ -111,6 +131,16 @@ class ReasoningChain3(Runnable):
             {"run_name": self.__class__.__name__}
         )  # Add a run name to the chain on LangSmith
 
+        # Persistent cache of extractions, keyed by the prompt version
+        self.cache = get_extraction_cache() if cache and not memory else None
+        self.prompt_version = prompt_version(
+            self.prompt,
+            self.llm,
+            categories=self.categories,
+            products=self.products,
+            format_instructions=self.format_instructions,
+        )
+
     def _format_product_database(self):
         """Format the product database into strings for categories and products."""
         categories = "\n".join(
@@ -123,23 +153,19 @@ class ReasoningChain3(Runnable):
         return categories, products
 
     def _get_product_by_name(self, name):
-        """Retrieve a product from the catalog by its name."""
-        return self.products_catalog.get(name, None)
+        """Retrieve a product from the catalog by its name, tolerating misspellings."""
+        return self.catalog.get(name)
 
     def _get_products_by_category(self, category):
         """Retrieve a list of products that belong to a specific category."""
-        return [
-            product
-            for product in self.products_catalog.values()
-            if product["category"] == category
-        ]
+        return self.catalog.get_by_category(category)
 
     def _generate_output_string(self, data_list):
         """Generate a formatted string output from a list of ProductCategory objects."""
-        output_string = ""
+        snippets = []
 
         if data_list is None:
-            return output_string
+            return ""
 
         for data in data_list:
             try:
@@ -148,18 +174,18 @@ class ReasoningChain3(Runnable):
 
                     # Process category-based product data
                     if data.category:
-                        category_products = self._get_products_by_category(
-                            data.category
+                        category = self.catalog.resolve_category(data.category)
+                        snippets.extend(
+                            self.catalog.snippets[name]
+                            for name in self.catalog.category_index.get(category, [])
                         )
-                        for product in category_products:
-                            output_string += json.dumps(product, indent=4) + "\n"
 
                     # Process product-based data
                     if data.products:
                         for product_name in data.products:
-                            product = self._get_product_by_name(product_name)
-                            if product:
-                                output_string += json.dumps(product, indent=4) + "\n"
+                            name = self.catalog.resolve(product_name)
+                            if name:
+                                snippets.append(self.catalog.snippets[name])
                             else:
                                 print(f"Error: Product '{product_name}' not found")
                 else:
@@ -167,23 +193,81 @@ class ReasoningChain3(Runnable):
             except Exception as e:
                 print(f"Error: {e}")
 
-        return output_string
-
-    def invoke(self, inputs) -> str:
-        with callbacks.collect_runs() as cb:
-            """Invoke the product information reasoning chain."""
-            response = self.chain.invoke(
-                {
-                    "customer_input": inputs["customer_input"],
-                    "categories": self.categories,
-                    "products": self.products,
-                    "format_instructions": self.format_instructions,
-                }
+        return "".join(snippets)
+
+    def _chain_inputs(self, inputs):
+        """Build the inputs of the underlying chain from the customer query."""
+        return {
+            "customer_input": inputs["customer_input"],
+            "categories": self.categories,
+            "products": self.products,
+            "format_instructions": self.format_instructions,
+        }
+
+    def _match_locally(self, inputs) -> Optional[ProductQueryResult]:
+        """Identify the mentioned products locally or from the cache, or None if unsure."""
+        if self.matcher is not None:
+            with get_metrics().timer("product_matcher"):
+                mentions = self.matcher.match(inputs["customer_input"])
+            if mentions is not None:
+                return self._mentions_to_result(mentions)
+
+        if self.cache is not None:
+            with get_metrics().timer("extraction_cache"):
+                return self.cache.get(
+                    self.__class__.__name__,
+                    self.prompt_version,
+                    inputs["customer_input"],
+                    ProductQueryResult,
+                )
+        return None
+
+    def _store(self, inputs, response: ProductQueryResult) -> None:
+        """Cache the extraction of a query made by the LLM."""
+        if self.cache is not None:
+            self.cache.set(
+                self.__class__.__name__,
+                self.prompt_version,
+                inputs["customer_input"],
+                response,
             )
 
-            # Generate and return the product information output
+    @staticmethod
+    def _mentions_to_result(mentions: ProductMentions) -> ProductQueryResult:
+        """Convert locally matched mentions to the structure returned by the LLM."""
+        results = [
+            ProductCategory(category=category) for category in mentions.categories
+        ]
+        if mentions.products:
+            # No category here, as a category expands to all of its products
+            results.append(ProductCategory(products=mentions.products))
+        return ProductQueryResult(results=results)
+
+    def invoke(self, inputs) -> str:
+        """Invoke the product information reasoning chain."""
+        response = self._match_locally(inputs)
+        if response is None:
+            with get_metrics().timer("reasoning_llm"):
+                response = self.chain.invoke(self._chain_inputs(inputs))
+            self._store(inputs, response)
+
+        # Generate and return the product information output
+        with get_metrics().timer("catalog_lookup"):
+            inputs["product_info"] = self._generate_output_string(response.results)
+        return inputs
+
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        """Asynchronously invoke the product information reasoning chain."""
+        response = self._match_locally(inputs)
+        if response is None:
+            with get_metrics().timer("reasoning_llm"):
+                response = await self.chain.ainvoke(self._chain_inputs(inputs))
+            self._store(inputs, response)
+
+        # Generate and return the product information output
+        with get_metrics().timer("catalog_lookup"):
             inputs["product_info"] = self._generate_output_string(response.results)
-            return inputs
+        return inputs
 
 
 # Customer Service Response Chain - Uses a language model (LLM) to generate customer service responses
@@ -220,6 +304,22 @@ class ResponseChain3(Runnable):
         self.chain = self.prompt | self.llm
 
     def invoke(self, inputs, config):
-        with callbacks.collect_runs() as cb:
-            """Invoke the product information response chain."""
+        """Invoke the product information response chain."""
+        with get_metrics().timer("response_llm"):
             return self.chain.invoke(inputs, config=config)
+
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        """Asynchronously invoke the product information response chain."""
+        with get_metrics().timer("response_llm"):
+            return await self.chain.ainvoke(inputs, config=config)
+
+    def stream(self, inputs, config=None, **kwargs):
+        """Stream the response of the chain token by token."""
+        with get_metrics().timer("response_llm"):
+            yield from self.chain.stream(inputs, config=config)
+
+    async def astream(self, inputs, config=None, **kwargs):
+        """Asynchronously stream the response of the chain token by token."""
+        with get_metrics().timer("response_llm"):
+            async for chunk in self.chain.astream(inputs, config=config):
+                yield chunk
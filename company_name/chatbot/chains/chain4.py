@@ -0,0 +1,169 @@
+# Import necessary libraries and modules
+import asyncio
+import re
+from typing import List, Optional
+
+from langchain.schema.runnable.base import Runnable
+from langchain_core.exceptions import OutputParserException
+
+from company_name.chatbot.chains.base import PromptTemplate, generate_prompt_templates
+from company_name.chatbot.chains.chain2 import Chain2
+from company_name.chatbot.metrics import get_metrics
+from company_name.data.database import OrderRow, get_database
+
+# Order numbers as customers write them, e.g. "#12345" or "order number 12345".
+# A bare "order 3" is not matched, as in "I placed an order 3 days ago".
+ORDER_ID_PATTERN = re.compile(
+    r"(?:#|\border\s*(?:number|no\.?|id)\s*:?)\s*(\d+)\b", re.IGNORECASE
+)
+
+# Number of recent orders listed when the query names no order
+MAX_ORDERS = 5
+
+
+class ReasoningChain4(Runnable):
+    """Chain that looks up the orders a customer query refers to."""
+
+    def __init__(self, llm, db_path=None, cache=True):
+        """Initialize the order status reasoning chain.
+
+        Args:
+            llm: The language model used to extract the order number when it is
+                not written in a recognizable form.
+            db_path: Path to the database file, `ecommerce.db` by default.
+            cache: Whether to reuse the extractions of previously seen queries.
+        """
+        super().__init__()
+        self.db = get_database(db_path)
+
+        # Fallback extraction of the order number by the language model
+        self.order_id_chain = Chain2(llm=llm, cache=cache)
+
+    @staticmethod
+    def _match_order_id(text: str) -> Optional[int]:
+        """Find the order number locally, or None if the text has none.
+
+        >>> ReasoningChain4._match_order_id("Where is order #12345?")
+        12345
+        >>> ReasoningChain4._match_order_id("Status of order number 77")
+        77
+        >>> ReasoningChain4._match_order_id("I placed an order 3 days ago") is None
+        True
+        >>> ReasoningChain4._match_order_id("My order 2 weeks ago hasn't arrived") is None
+        True
+        """
+        match = ORDER_ID_PATTERN.search(text)
+        return int(match.group(1)) if match else None
+
+    def _format_orders(self, rows: List[OrderRow], order_id: Optional[int]) -> str:
+        """Generate a formatted string output from the looked up orders."""
+        if not rows:
+            if order_id is not None:
+                return f"No order #{order_id} was found for this customer."
+            return "This customer has no orders."
+
+        return "\n".join(
+            f"Order #{row.order_id}: {row.quantity} x {row.product_name}, "
+            f"total ${row.total_amount:.2f}, placed on {row.order_date}"
+            for row in rows[:MAX_ORDERS]
+        )
+
+    def _lookup(self, inputs, order_id: Optional[int]):
+        """Add the orders of the customer matching the order number to the inputs."""
+        with get_metrics().timer("order_lookup"):
+            try:
+                customer_id = int(inputs["customer_id"])
+            except (TypeError, ValueError):
+                rows = []  # Not a customer of the store
+            else:
+                rows = self.db.get_customer_orders(customer_id, order_id)
+
+            inputs["order_info"] = self._format_orders(rows, order_id)
+        return inputs
+
+    def invoke(self, inputs, config=None, **kwargs):
+        """Invoke the order status reasoning chain."""
+        text = inputs["customer_input"]
+        order_id = self._match_order_id(text)
+
+        # Only ask the language model when the text has a number it may be
+        if order_id is None and any(char.isdigit() for char in text):
+            with get_metrics().timer("reasoning_llm"):
+                try:
+                    order_id = self.order_id_chain.invoke(inputs).order_id
+                except OutputParserException:
+                    order_id = None
+
+        return self._lookup(inputs, order_id)
+
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        """Asynchronously invoke the order status reasoning chain."""
+        text = inputs["customer_input"]
+        order_id = self._match_order_id(text)
+
+        # Only ask the language model when the text has a number it may be
+        if order_id is None and any(char.isdigit() for char in text):
+            with get_metrics().timer("reasoning_llm"):
+                try:
+                    response = await asyncio.to_thread(
+                        self.order_id_chain.invoke, inputs
+                    )
+                    order_id = response.order_id
+                except OutputParserException:
+                    order_id = None
+
+        return self._lookup(inputs, order_id)
+
+
+# Customer Service Response Chain - Uses a language model (LLM) to answer order status queries
+class ResponseChain4(Runnable):
+    """Chain that generates a response to customer queries about their orders."""
+
+    def __init__(self, llm, memory=True):
+        """Initialize the order status response chain."""
+        super().__init__()
+        self.llm = llm
+
+        # Define the prompt template for customer service interaction
+        prompt_template = PromptTemplate(
+            system_template="""
+            You are a friendly and helpful customer service assistant for a large electronics store.
+            Follow these guidelines:
+            1. Answer using only the order information provided
+            2. If the order was not found, ask the customer to check the order number
+            3. Provide concise, helpful responses
+            4. Be professional but conversational in tone
+            """,
+            human_template="""
+            Order Information:
+            {order_info}
+
+            Customer Query: {customer_input}
+            """,
+        )
+
+        self.prompt = generate_prompt_templates(prompt_template, memory=memory)
+
+        # Chain to combine the prompt with LLM processing
+        self.chain = self.prompt | self.llm
+
+    def invoke(self, inputs, config=None, **kwargs):
+        """Invoke the order status response chain."""
+        with get_metrics().timer("response_llm"):
+            return self.chain.invoke(inputs, config=config)
+
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        """Asynchronously invoke the order status response chain."""
+        with get_metrics().timer("response_llm"):
+            return await self.chain.ainvoke(inputs, config=config)
+
+    def stream(self, inputs, config=None, **kwargs):
+        """Stream the response of the chain token by token."""
+        with get_metrics().timer("response_llm"):
+            yield from self.chain.stream(inputs, config=config)
+
+    async def astream(self, inputs, config=None, **kwargs):
+        """Asynchronously stream the response of the chain token by token."""
+        with get_metrics().timer("response_llm"):
+            async for chunk in self.chain.astream(inputs, config=config):
+                yield chunk
@@ -0,0 +1,63 @@
+# Import necessary libraries and modules
+from typing import List
+
+from langchain.schema.runnable.base import Runnable
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.output_parsers import StrOutputParser
+
+from company_name.chatbot.chains.base import PromptTemplate, generate_prompt_templates
+
+
+# Conversation Summary Chain - Uses a language model (LLM) to fold old turns into a summary
+class SummaryChain(Runnable):
+    """Chain that extends a running conversation summary with new messages."""
+
+    def __init__(self, llm):
+        """Initialize the conversation summary chain."""
+        super().__init__()
+        self.llm = llm
+
+        # Define the prompt template for progressive summarization
+        prompt_template = PromptTemplate(
+            system_template="""
+            You summarize customer service conversations for an electronics store.
+            Extend the current summary with the new lines of conversation.
+            Keep the products, order numbers, quantities and open questions mentioned,
+            and drop greetings and small talk. Answer with the new summary only.
+            """,
+            human_template="""
+            Current summary:
+            {summary}
+
+            New lines of conversation:
+            {new_lines}
+            """,
+        )
+
+        self.prompt = generate_prompt_templates(prompt_template, memory=False)
+        self.chain = (self.prompt | self.llm | StrOutputParser()).with_config(
+            {"run_name": self.__class__.__name__}
+        )  # Add a run name to the chain on LangSmith
+
+    def invoke(self, inputs, config=None, **kwargs) -> str:
+        """Invoke the conversation summary chain."""
+        return self.chain.invoke(inputs, config=config)
+
+    def summarize(self, summary: str, messages: List[BaseMessage]) -> str:
+        """Fold a list of messages into an existing summary.
+
+        Args:
+            summary: The current summary, empty if there is none yet.
+            messages: The messages to fold into the summary.
+
+        Returns:
+            The updated summary.
+        """
+        return self.invoke(
+            {
+                "summary": summary or "(empty)",
+                "new_lines": get_buffer_string(
+                    messages, human_prefix="User", ai_prefix="Bot"
+                ),
+            }
+        )
@@ -1,8 +1,9 @@
 # Import necessary classes and modules for chatbot functionality
-from typing import Dict
+from typing import Dict, Optional
 
 from company_name.chatbot.bot import MainChatbot
 from company_name.chatbot.router.auxiliar import add_message
+from company_name.chatbot.router.updater import RouterUpdater
 
 
 class DevChatbot(MainChatbot):
@@ -10,18 +11,32 @@ class DevChatbot(MainChatbot):
     interaction with developers for testing and updating intents.
     """
 
-    def __init__(self, user_id: str, conversation_id: str, intentions: list):
+    def __init__(
+        self,
+        user_id: str,
+        conversation_id: str,
+        intentions: list,
+        layer_path: Optional[str] = None,
+        **kwargs,
+    ):
         """Initialize the development bot with additional functionality.
 
         Args:
             user_id: Identifier for the user.
             conversation_id: Identifier for the conversation.
             intentions: A list of available intentions for the bot.
+            layer_path: Path to the route layer file of the classifier, where the
+                corrected messages are written, `layer.json` by default.
+            **kwargs: Keyword arguments of the base bot, e.g. its llm or classifier.
         """
-        # Initialize the base bot class
-        super().__init__(user_id, conversation_id)
+        # Initialize the base bot class and log in to the developer session
+        super().__init__(**kwargs)
+        self.user_login(user_id, conversation_id)
         self.intentions = intentions  # Store the list of available intentions
 
+        # Apply corrected messages to the live router, persisting them in the background
+        self.router_updater = RouterUpdater(self.intention_classifier, layer_path)
+
     def get_choice_from_list(self):
         """Present a list of available intentions to the user and allow selection.
 
@@ -80,6 +95,13 @@ class DevChatbot(MainChatbot):
         # Save the new intention and message to a JSON file
         add_message(new_item, "new_intentions.json")
 
+        # Route the message correctly from now on, reusing its router embedding
+        if new_intention in self.intention_classifier.route_names:
+            message = user_input["customer_input"]
+            self.router_updater.add(
+                [message], [new_intention], [self.get_query_embedding(message)]
+            )
+
     def process_user_input(self, user_input: Dict):
         """Process user input by routing through the intention pipeline or allowing for updates.
 
@@ -0,0 +1,174 @@
+# Import necessary modules and classes
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+# Queue marker asking the writer thread to fsync immediately
+_FLUSH = object()
+
+# Journal record marking that the history was cleared, replaying starts after it
+RESET_RECORD = {"type": "reset"}
+
+
+class TranscriptJournal:
+    """Append-only JSON Lines journal of session transcripts.
+
+    Each session is written to its own `{user_id}_{conversation_id}_history.jsonl`
+    file, one message per line. Writes are queued and performed by a background
+    thread, so appending never blocks the response path, and files are fsynced
+    in batches at most once every `fsync_interval` seconds.
+    """
+
+    def __init__(self, directory: str = ".", fsync_interval: float = 1.0):
+        """Initialize the journal and start its writer thread.
+
+        Args:
+            directory: Directory where the journal files are written.
+            fsync_interval: Minimum number of seconds between two fsyncs.
+        """
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+
+        self._queue: queue.Queue = queue.Queue()
+        # Files written since the last fsync, closed once synced
+        self._files: Dict[Tuple[str, str], TextIO] = {}
+        self._last_fsync = time.monotonic()
+
+        self._writer = threading.Thread(
+            target=self._run, name="TranscriptJournal", daemon=True
+        )
+        self._writer.start()
+
+        # Make sure queued messages reach the disk when the process exits
+        atexit.register(self.close)
+
+    def get_path(self, user_id: str, conversation_id: str) -> str:
+        """Return the path of the journal file of a session.
+
+        Args:
+            user_id: Identifier for the user.
+            conversation_id: Identifier for the conversation.
+
+        Returns:
+            The path of the journal file.
+        """
+        return os.path.join(
+            self.directory, f"{user_id}_{conversation_id}_history.jsonl"
+        )
+
+    def append(
+        self,
+        user_id: str,
+        conversation_id: str,
+        messages: List[BaseMessage],
+        reset: bool = False,
+    ) -> None:
+        """Queue messages to be appended to the journal of a session.
+
+        Args:
+            user_id: Identifier for the user.
+            conversation_id: Identifier for the conversation.
+            messages: The new messages of the session, in order.
+            reset: Whether the history was cleared before these messages, in
+                which case the journaled messages before them are not replayed.
+        """
+        if not messages and not reset:
+            return
+
+        # Serialize in the caller thread, so later changes to the messages are not seen
+        lines = [json.dumps(RESET_RECORD)] if reset else []
+        lines += [json.dumps(message_to_dict(message)) for message in messages]
+        self._queue.put((user_id, conversation_id, lines))
+
+    def load(self, user_id: str, conversation_id: str) -> Optional[List[BaseMessage]]:
+        """Read back the messages journaled for a session since its last clear.
+
+        Args:
+            user_id: Identifier for the user.
+            conversation_id: Identifier for the conversation.
+
+        Returns:
+            The messages of the session, or None if it has no journal.
+        """
+        path = self.get_path(user_id, conversation_id)
+        if not os.path.exists(path):
+            return None
+
+        records = []
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A crash can leave a truncated line, keep the others
+
+                if record == RESET_RECORD:
+                    records = []  # The history was cleared here
+                else:
+                    records.append(record)
+
+        return messages_from_dict(records)
+
+    def flush(self) -> None:
+        """Block until every queued message has been written and fsynced."""
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self) -> None:
+        """Write the queued messages, fsync and stop the writer thread."""
+        if not self._writer.is_alive():
+            return
+        self._queue.put(None)
+        self._writer.join()
+
+    def _run(self) -> None:
+        """Write queued messages until `close` is called."""
+        while True:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                self._sync()
+                continue
+
+            try:
+                if item is None:
+                    self._sync(force=True)
+                    return
+                elif item is _FLUSH:
+                    self._sync(force=True)
+                else:
+                    self._write(*item)
+                    self._sync()
+            finally:
+                self._queue.task_done()
+
+    def _write(self, user_id: str, conversation_id: str, lines: List[str]) -> None:
+        """Append serialized messages to the file of a session."""
+        key = (user_id, conversation_id)
+
+        if key not in self._files:
+            os.makedirs(self.directory, exist_ok=True)
+            self._files[key] = open(self.get_path(user_id, conversation_id), "a")
+
+        self._files[key].write("\n".join(lines) + "\n")
+
+    def _sync(self, force: bool = False) -> None:
+        """Fsync and close the files written since the last sync, at most once per interval."""
+        if not self._files:
+            return
+        if not force and time.monotonic() - self._last_fsync < self.fsync_interval:
+            return
+
+        for file in self._files.values():
+            file.flush()
+            os.fsync(file.fileno())
+            file.close()
+
+        self._files.clear()
+        self._last_fsync = time.monotonic()
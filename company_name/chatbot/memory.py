@@ -1,13 +1,26 @@
 # Import necessary modules and classes
 import json
-from typing import Dict, List, Tuple
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
 
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_core.messages import BaseMessage
-from langchain_core.messages.ai import AIMessage
-from langchain_core.messages.human import HumanMessage
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+from langchain_core.messages.system import SystemMessage
 from langchain_core.runnables import ConfigurableFieldSpec
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from company_name.chatbot.journal import TranscriptJournal
+from company_name.chatbot.metrics import get_metrics
+
+# Directory of the spilled sessions and transcript journals, kept out of git
+STATE_DIR = os.path.join(os.path.dirname(__file__), "state")
+SPILL_PATH = os.path.join(STATE_DIR, "sessions.db")
+JOURNAL_DIR = os.path.join(STATE_DIR, "journals")
 
 
 class InMemoryHistory(BaseChatMessageHistory, BaseModel):
@@ -17,6 +30,20 @@ class InMemoryHistory(BaseChatMessageHistory, BaseModel):
     """
 
     messages: List[BaseMessage] = Field(default_factory=list)
+    summary: str = Field(default="", description="Rolling summary of old messages")
+    summary_index: int = Field(
+        default=0, description="Number of leading messages folded into the summary"
+    )
+    journal_index: int = Field(
+        default=0, description="Number of leading messages written to the journal"
+    )
+    journal_reset: bool = Field(
+        default=False,
+        description="Whether the history was cleared since the last journal write",
+    )
+
+    # Serializes the folds of the summary by concurrent turns of the session
+    _fold_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
 
     def add_messages(self, messages: List[BaseMessage]):
         """Add a list of messages to the in-memory store."""
@@ -25,6 +52,330 @@ class InMemoryHistory(BaseChatMessageHistory, BaseModel):
     def clear(self) -> None:
         """Clear all messages from the in-memory store."""
         self.messages = []
+        self.summary = ""
+        self.summary_index = 0
+        self.journal_index = 0
+        self.journal_reset = True
+
+    def dumps(self) -> str:
+        """Serialize the history, including its summary, to a JSON string."""
+        return json.dumps(
+            {
+                "messages": messages_to_dict(self.messages),
+                "summary": self.summary,
+                "summary_index": self.summary_index,
+                "journal_index": self.journal_index,
+                "journal_reset": self.journal_reset,
+            }
+        )
+
+    @classmethod
+    def loads(cls, data: str) -> "InMemoryHistory":
+        """Deserialize a history produced by `dumps`."""
+        data = json.loads(data)
+        return cls(
+            messages=messages_from_dict(data["messages"]),
+            summary=data.get("summary", ""),
+            summary_index=data.get("summary_index", 0),
+            journal_index=data.get("journal_index", 0),
+            journal_reset=data.get("journal_reset", False),
+        )
+
+
+def approximate_token_count(message: BaseMessage) -> int:
+    """Estimate the number of tokens of a message, about four characters per token."""
+    content = (
+        message.content if isinstance(message.content, str) else str(message.content)
+    )
+    return len(content) // 4 + 4  # Add the per-message overhead of chat formats
+
+
+class SummaryBufferHistory(BaseChatMessageHistory):
+    """Token-budgeted view over a session history.
+
+    Exposes the most recent messages that fit in `max_tokens` verbatim, preceded
+    by a system message summarizing everything older. The summary is stored on
+    the underlying history and extended incrementally when messages are added:
+    only the messages that fall out of the window are folded into it, and only
+    when the window overflows, so most turns reuse the cached summary as is.
+    Reading the messages never calls the summarizer.
+    """
+
+    def __init__(
+        self,
+        history: InMemoryHistory,
+        summarize: Callable[[str, List[BaseMessage]], str],
+        max_tokens: int = 2000,
+        fold_ratio: float = 0.5,
+        token_counter: Callable[[BaseMessage], int] = approximate_token_count,
+    ):
+        """Initialize the view over a session history.
+
+        Args:
+            history: The full history of the session.
+            summarize: Callable folding messages into a summary, e.g. SummaryChain.summarize.
+            max_tokens: Token budget of the messages kept verbatim.
+            fold_ratio: Fraction of the budget kept verbatim after folding, so the
+                summary is only extended every few turns.
+            token_counter: Callable returning the number of tokens of a message.
+        """
+        self.history = history
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.fold_ratio = fold_ratio
+        self.token_counter = token_counter
+
+    def _window_start(self, budget: int) -> int:
+        """Return the index of the oldest unsummarized message that fits in a budget."""
+        messages = self.history.messages
+        start = len(messages)
+        used = 0
+
+        while start > self.history.summary_index:
+            used += self.token_counter(messages[start - 1])
+            if used > budget:
+                break
+            start -= 1
+
+        return start
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """The summary of older messages followed by the recent messages.
+
+        Messages added directly to the underlying history may overflow the
+        budget until the next fold; the oldest of them are left out meanwhile.
+        """
+        history = self.history
+
+        recent = history.messages[self._window_start(self.max_tokens) :]
+        if not history.summary:
+            return list(recent)
+
+        summary = SystemMessage(
+            content=f"Summary of the earlier conversation:\n{history.summary}"
+        )
+        return [summary, *recent]
+
+    def fold(self) -> None:
+        """Fold the messages that no longer fit the budget into the summary.
+
+        Concurrent folds of the same history are serialized, so each message
+        is summarized once.
+        """
+        history = self.history
+
+        with history._fold_lock:
+            if self._window_start(self.max_tokens) <= history.summary_index:
+                return  # The recent messages still fit the budget
+
+            start = self._window_start(int(self.max_tokens * self.fold_ratio))
+            with get_metrics().timer("memory_summarize"):
+                history.summary = self.summarize(
+                    history.summary, history.messages[history.summary_index : start]
+                )
+            history.summary_index = start
+
+    def add_messages(self, messages: List[BaseMessage]) -> None:
+        """Add messages to the underlying history, then fold it if it overflows."""
+        self.history.add_messages(messages)
+        self.fold()
+
+    def clear(self) -> None:
+        """Clear the underlying history and its summary."""
+        self.history.clear()
+
+
+class SessionStore:
+    """Bounded store of session histories with LRU and idle-TTL eviction.
+
+    Sessions evicted from memory are spilled to an SQLite table and reloaded
+    transparently the next time they are requested. A session pinned by a turn
+    in progress is never spilled, since messages added to its history after the
+    spill would be lost; it becomes evictable again once the turn releases it.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        ttl: Optional[float] = 3600.0,
+        spill_path: str = SPILL_PATH,
+        loader: Optional[Callable[[str, str], Optional[InMemoryHistory]]] = None,
+    ):
+        """Initialize the session store.
+
+        Args:
+            max_sessions: Maximum number of sessions kept in memory.
+            ttl: Seconds a session can stay idle in memory, None to disable.
+            spill_path: Path of the SQLite database holding evicted sessions.
+            loader: Callable rebuilding a session that is neither in memory nor
+                spilled, e.g. from a transcript journal after a restart.
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.spill_path = spill_path
+        self.loader = loader
+
+        # Sessions ordered from least to most recently used, with their last access
+        self._sessions: (
+            "OrderedDict[Tuple[str, str], Tuple[InMemoryHistory, float]]"
+        ) = OrderedDict()
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+        # Number of turns in progress holding each session
+        self._pins: Dict[Tuple[str, str], int] = {}
+
+        # Counters exposed through `stats`
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Open the spill database on first use."""
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS sessions
+                   (user_id TEXT,
+                    conversation_id TEXT,
+                    messages TEXT,
+                    PRIMARY KEY (user_id, conversation_id))""")
+        return self._connection
+
+    def get_or_create(self, user_id: str, conversation_id: str) -> InMemoryHistory:
+        """Return the history of a session, reloading or creating it if needed.
+
+        Args:
+            user_id: Identifier for the user.
+            conversation_id: Identifier for the conversation.
+
+        Returns:
+            The in-memory history of the session.
+        """
+        key = (user_id, conversation_id)
+        now = time.monotonic()
+
+        with self._lock:
+            if key in self._sessions:
+                self.hits += 1
+                history = self._sessions[key][0]
+                self._sessions.move_to_end(key)
+            else:
+                self.misses += 1
+                history = self._reload(key)
+                if history is None and self.loader is not None:
+                    history = self.loader(user_id, conversation_id)
+                if history is None:
+                    history = InMemoryHistory()
+
+            self._sessions[key] = (history, now)
+            self._evict(now)
+
+            return history
+
+    @contextmanager
+    def pin(self, user_id: str, conversation_id: str):
+        """Keep a session in memory while a turn uses its history.
+
+        Args:
+            user_id: Identifier for the user.
+            conversation_id: Identifier for the conversation.
+
+        Yields:
+            The in-memory history of the session.
+        """
+        key = (user_id, conversation_id)
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+            try:
+                history = self.get_or_create(user_id, conversation_id)
+            except BaseException:
+                self._unpin(key)
+                raise
+
+        try:
+            yield history
+        finally:
+            with self._lock:
+                self._unpin(key)
+
+    def _unpin(self, key: Tuple[str, str]) -> None:
+        """Release a pin, spilling the sessions left over the limit while it was held."""
+        self._pins[key] -= 1
+        if self._pins[key] == 0:
+            del self._pins[key]
+            self._evict(time.monotonic())
+
+    def _reload(self, key: Tuple[str, str]) -> Optional[InMemoryHistory]:
+        """Move a spilled session back from the SQLite table into memory."""
+        if self._connection is None and not os.path.exists(self.spill_path):
+            return None  # Nothing was ever spilled
+
+        connection = self._get_connection()
+        row = connection.execute(
+            "SELECT messages FROM sessions WHERE user_id = ? AND conversation_id = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+
+        with connection:
+            connection.execute(
+                "DELETE FROM sessions WHERE user_id = ? AND conversation_id = ?", key
+            )
+
+        self.reloads += 1
+        return InMemoryHistory.loads(row[0])
+
+    def _evict(self, now: float) -> None:
+        """Spill idle sessions and the least recently used ones above the limit."""
+        victims = []
+        excess = len(self._sessions) - self.max_sessions
+
+        # Sessions are ordered by last access, so idle ones are at the front
+        for key, (history, last_access) in self._sessions.items():
+            expired = self.ttl is not None and now - last_access > self.ttl
+            if not expired and excess <= 0:
+                break
+            if key in self._pins:
+                continue  # In use by a turn, spilled once released if still needed
+            victims.append((key, history))
+            excess -= 1
+
+        if not victims:
+            return
+
+        for key, _ in victims:
+            del self._sessions[key]
+
+        connection = self._get_connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                [(key[0], key[1], history.dumps()) for key, history in victims],
+            )
+        self.evictions += len(victims)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        """Check whether a session is currently held in memory."""
+        return key in self._sessions
+
+    def __len__(self) -> int:
+        """Return the number of sessions held in memory."""
+        return len(self._sessions)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss, eviction and reload counters of the store."""
+        return {
+            "sessions": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+        }
 
 
 class MemoryManager:
@@ -34,9 +385,38 @@ class MemoryManager:
     session histories.
     """
 
-    def __init__(self):
-        """Initialize session manager."""
-        self.store: Dict[Tuple[str, str], InMemoryHistory] = {}
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        session_ttl: Optional[float] = 3600.0,
+        spill_path: str = SPILL_PATH,
+        summarize: Optional[Callable[[str, List[BaseMessage]], str]] = None,
+        max_history_tokens: int = 2000,
+        journal_dir: str = JOURNAL_DIR,
+        fsync_interval: float = 1.0,
+    ):
+        """Initialize session manager.
+
+        Args:
+            max_sessions: Maximum number of sessions kept in memory.
+            session_ttl: Seconds a session can stay idle in memory, None to disable.
+            spill_path: Path of the SQLite database holding evicted sessions.
+            summarize: Callable folding old messages into a summary. When None,
+                prompts receive the full history.
+            max_history_tokens: Token budget of the history kept verbatim in prompts.
+            journal_dir: Directory where session transcripts are journaled.
+            fsync_interval: Minimum number of seconds between two journal fsyncs.
+        """
+        self.summarize = summarize
+        self.max_history_tokens = max_history_tokens
+        self.journal = TranscriptJournal(journal_dir, fsync_interval=fsync_interval)
+        self._journal_lock = threading.Lock()
+        self.store = SessionStore(
+            max_sessions=max_sessions,
+            ttl=session_ttl,
+            spill_path=spill_path,
+            loader=self.restore_session_history,
+        )
         self.history_factory_config = [
             ConfigurableFieldSpec(
                 id="user_id",
@@ -68,11 +448,43 @@ class MemoryManager:
         Returns:
             An instance of BaseChatMessageHistory for managing the chat history.
         """
-        if (user_id, conversation_id) not in self.store:
-            # Initialize new in-memory history if not already stored
-            self.store[(user_id, conversation_id)] = InMemoryHistory()
+        # Reload spilled sessions or initialize new in-memory history if needed
+        return self.store.get_or_create(user_id, conversation_id)
+
+    def pin_session(self, user_id: str, conversation_id: str):
+        """Keep the history of a session in memory for the duration of a turn.
 
-        return self.store[(user_id, conversation_id)]
+        Args:
+            user_id: Identifier for the user.
+            conversation_id: Identifier for the conversation.
+
+        Returns:
+            A context manager yielding the session history.
+        """
+        return self.store.pin(user_id, conversation_id)
+
+    def get_prompt_history(
+        self, user_id: str, conversation_id: str
+    ) -> BaseChatMessageHistory:
+        """Retrieve the history of a session as injected into prompts.
+
+        Args:
+            user_id: Identifier for the user.
+            conversation_id: Identifier for the conversation.
+
+        Returns:
+            A token-budgeted view of the session history if a summarizer is
+            configured, the full session history otherwise.
+        """
+        with get_metrics().timer("memory_read"):
+            history = self.get_session_history(user_id, conversation_id)
+
+        if self.summarize is None:
+            return history
+
+        return SummaryBufferHistory(
+            history, self.summarize, max_tokens=self.max_history_tokens
+        )
 
     def get_history_factory_config(self) -> List[ConfigurableFieldSpec]:
         """Retrieve configuration settings for history factory.
@@ -82,24 +494,42 @@ class MemoryManager:
         """
         return self.history_factory_config
 
-    def save_session_history(self, user_id: str, conversation_id: str) -> None:
-        """Save the session history as a txt file.
+    def restore_session_history(
+        self, user_id: str, conversation_id: str
+    ) -> Optional[InMemoryHistory]:
+        """Rebuild the history of a session from its journal.
 
         Args:
             user_id: Identifier for the user.
             conversation_id: Identifier for the conversation.
+
+        Returns:
+            The rebuilt history, or None if the session was never journaled.
         """
+        messages = self.journal.load(user_id, conversation_id)
+        if messages is None:
+            return None
+
+        return InMemoryHistory(messages=messages, journal_index=len(messages))
 
+    def save_session_history(self, user_id: str, conversation_id: str) -> None:
+        """Append the messages added since the last save to the session journal.
+
+        The write happens on the journal's background thread, so this call
+        returns immediately.
+
+        Args:
+            user_id: Identifier for the user.
+            conversation_id: Identifier for the conversation.
+        """
         session_history = self.get_session_history(
             user_id=user_id, conversation_id=conversation_id
         )
 
-        # Iterate over messages in the session history
-        # and save them to a text file
-        with open(f"{user_id}_{conversation_id}_history.txt", "w") as file:
-            for message in session_history.messages:
-                # Check if is HumanMessage or AIMessage
-                if isinstance(message, HumanMessage):
-                    file.write(f"User: {message.content}\n")
-                elif isinstance(message, AIMessage):
-                    file.write(f"Bot: {message.content}\n")
+        # Only hand the new messages to the journal, once, after the mark of a
+        # clear so the cleared messages are not replayed
+        with get_metrics().timer("memory_write"), self._journal_lock:
+            new_messages = session_history.messages[session_history.journal_index :]
+            session_history.journal_index += len(new_messages)
+            reset, session_history.journal_reset = session_history.journal_reset, False
+            self.journal.append(user_id, conversation_id, new_messages, reset=reset)
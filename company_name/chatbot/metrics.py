@@ -0,0 +1,220 @@
+# Import necessary modules and classes
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# Number of recent samples per stage used for the JSON quantiles
+WINDOW_SIZE = 1000
+
+# Number of recent turn traces kept in memory
+TRACE_SIZE = 100
+
+# Trace of the turn being processed, shared by the stages it awaits
+_current_trace: contextvars.ContextVar[Optional[Dict[str, Any]]] = (
+    contextvars.ContextVar("current_trace", default=None)
+)
+
+
+class Histogram:
+    """Latency histogram with cumulative buckets and a window of recent samples."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque = deque(maxlen=WINDOW_SIZE)
+
+    def observe(self, value: float) -> None:
+        """Record a sample."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantile(self, q: float) -> float:
+        """Return a quantile of the recent samples, or 0 without samples."""
+        if not self.recent:
+            return 0.0
+        samples = sorted(self.recent)
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+class MetricsRegistry:
+    """In-process latency metrics of the chatbot stages.
+
+    Stages are timed with `timer`, and each turn opened with `turn` also keeps a
+    trace of the duration of its stages, so slow turns can be attributed to a
+    stage. Histograms are exported in the Prometheus text format, e.g. for the
+    node exporter textfile collector, or as a JSON snapshot.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Initialize an empty registry.
+
+        Args:
+            buckets: Upper bounds, in seconds, of the histogram buckets.
+        """
+        self.buckets = buckets
+        self.histograms: Dict[str, Histogram] = {}
+        self.traces: deque = deque(maxlen=TRACE_SIZE)
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record the duration of a stage.
+
+        Args:
+            stage: Name of the stage, e.g. "router_encode".
+            seconds: Duration of the stage.
+        """
+        with self._lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = Histogram(self.buckets)
+            self.histograms[stage].observe(seconds)
+
+        trace = _current_trace.get()
+        if trace is not None:
+            trace["stages"].append((stage, seconds))
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time the enclosed block as a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    @contextmanager
+    def turn(self) -> Iterator[Dict[str, Any]]:
+        """Trace the enclosed block as a turn, timed as the "turn" stage.
+
+        Yields:
+            The trace of the turn, to which attributes such as the intent can be added.
+        """
+        trace: Dict[str, Any] = {"started": time.time(), "stages": []}
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace["seconds"] = time.perf_counter() - start
+            self.observe("turn", trace["seconds"])
+            with self._lock:
+                self.traces.append(trace)
+
+    def annotate(self, **attributes: Any) -> None:
+        """Add attributes, such as the intent, to the trace of the current turn."""
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.update(attributes)
+
+    def slowest_turns(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Return the slowest recent turns with the duration of their stages."""
+        with self._lock:
+            traces = list(self.traces)
+        return sorted(traces, key=lambda trace: trace["seconds"], reverse=True)[:n]
+
+    def to_prometheus(self, name: str = "chatbot_stage_latency_seconds") -> str:
+        """Render the histograms in the Prometheus text exposition format.
+
+        Args:
+            name: Name of the histogram metric.
+
+        Returns:
+            The metrics as text.
+        """
+        lines = [
+            f"# HELP {name} Latency of the chatbot stages in seconds.",
+            f"# TYPE {name} histogram",
+        ]
+
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip([*histogram.buckets, "+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> Dict[str, Dict[str, float]]:
+        """Summarize every histogram, with quantiles over the recent samples.
+
+        Returns:
+            Mapping of stage names to their count, sum, mean and p50/p95/p99.
+        """
+        with self._lock:
+            return {
+                stage: {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count,
+                    "p50": histogram.quantile(0.50),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                }
+                for stage, histogram in sorted(self.histograms.items())
+            }
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the Prometheus text export to a file, atomically."""
+        self._write(path, self.to_prometheus())
+
+    def write_json(self, path: str) -> None:
+        """Write the JSON snapshot to a file, atomically."""
+        self._write(path, json.dumps(self.to_json(), indent=4))
+
+    @staticmethod
+    def _write(path: str, content: str) -> None:
+        """Replace a file so readers never see a partial export."""
+        with open(f"{path}.tmp", "w") as file:
+            file.write(content)
+        os.replace(f"{path}.tmp", path)
+
+    def reset(self) -> None:
+        """Drop every histogram and trace."""
+        with self._lock:
+            self.histograms.clear()
+            self.traces.clear()
+
+
+@lru_cache(maxsize=None)
+def get_metrics() -> MetricsRegistry:
+    """
+    Return the metrics registry shared by the whole process.
+
+    Returns:
+        The shared MetricsRegistry instance.
+    """
+    return MetricsRegistry()
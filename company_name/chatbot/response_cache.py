@@ -0,0 +1,171 @@
+# Import necessary modules and classes
+import threading
+import time
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+# Minimum cosine similarity for a past query to be considered a near-duplicate
+SIMILARITY_THRESHOLD = 0.95
+
+
+class SemanticResponseCache:
+    """Cache of final responses looked up by query embedding.
+
+    Entries are grouped by a key (e.g. the intent and the resolved products), and
+    a query is served from the cache when a past query with the same key has a
+    cosine similarity above `threshold`. The embeddings live in one preallocated
+    matrix, so a lookup is a single matrix-vector product. Entries expire after
+    `ttl` seconds, and the least recently used entry is replaced once full.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = 1000,
+        ttl: float = 3600.0,
+    ):
+        """Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity to serve a cached response.
+            max_entries: Maximum number of cached responses.
+            ttl: Number of seconds a response stays valid.
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # Allocated on the first insertion, once the embedding size is known
+        self._vectors: Optional[np.ndarray] = None
+        self._keys = np.full(max_entries, -1, dtype=np.int64)  # -1 marks a free slot
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._responses: List[Optional[str]] = [None] * max_entries
+        self._slot_keys: List[Optional[Hashable]] = [None] * max_entries
+
+        # Id of every key held by a slot, with its number of slots
+        self._key_ids: Dict[Hashable, int] = {}
+        self._key_counts: Dict[Hashable, int] = {}
+        self._next_key_id = 0
+        self._lock = threading.Lock()
+
+        # Counters exposed through `stats`
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        """Scale a vector to unit length."""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, vector: np.ndarray, key: Hashable) -> Optional[str]:
+        """Find the response of a near-duplicate past query.
+
+        Args:
+            vector: Embedding of the query.
+            key: Key the past query must share, e.g. (intent, resolved products).
+
+        Returns:
+            The cached response, or None on a miss.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            key_id = self._key_ids.get(key)
+            if self._vectors is None or key_id is None:
+                self.misses += 1
+                return None
+
+            # Only compare against live entries sharing the key
+            candidates = np.flatnonzero(
+                (self._keys == key_id) & (now - self._created < self.ttl)
+            )
+            if candidates.size == 0:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors[candidates] @ self._normalize(vector)
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            slot = candidates[best]
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._responses[slot]
+
+    def add(self, vector: np.ndarray, key: Hashable, response: str) -> None:
+        """Cache the response of a query.
+
+        Args:
+            vector: Embedding of the query.
+            key: Key of the query, e.g. (intent, resolved products).
+            response: The final response to the query.
+        """
+        vector = self._normalize(vector)
+        now = time.monotonic()
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self.max_entries, vector.shape[0]), dtype=np.float32
+                )
+
+            # Use a free or expired slot first, then the least recently used one
+            stale = (self._keys == -1) | (now - self._created >= self.ttl)
+            if stale.any():
+                slot = int(stale.argmax())
+            else:
+                slot = int(self._last_used.argmin())
+                self.evictions += 1
+
+            self._release_slot(slot)
+            if key not in self._key_ids:
+                self._key_ids[key] = self._next_key_id
+                self._key_counts[key] = 0
+                self._next_key_id += 1
+            self._key_counts[key] += 1
+            self._slot_keys[slot] = key
+
+            self._vectors[slot] = vector
+            self._keys[slot] = self._key_ids[key]
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._responses[slot] = response
+
+    def _release_slot(self, slot: int) -> None:
+        """Detach a slot from its key, forgetting the key once it holds no slot."""
+        key = self._slot_keys[slot]
+        if key is None:
+            return
+
+        self._slot_keys[slot] = None
+        self._key_counts[key] -= 1
+        if self._key_counts[key] == 0:
+            del self._key_counts[key]
+            del self._key_ids[key]
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._keys[:] = -1
+            self._responses = [None] * self.max_entries
+            self._slot_keys = [None] * self.max_entries
+            self._key_ids.clear()
+            self._key_counts.clear()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Hit, miss and eviction counters, with the hit rate and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": int((self._keys != -1).sum()),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
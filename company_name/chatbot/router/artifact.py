@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from company_name.chatbot.router.auxiliar import locked
+from company_name.chatbot.router.encoders import MAX_LENGTH
+
+# Directory where compiled router artifacts are stored
+BASE_DIR = os.path.dirname(__file__)
+ARTIFACT_DIR = os.path.join(BASE_DIR, "compiled")
+
+# Threshold used by routes that do not define their own
+DEFAULT_SCORE_THRESHOLD = 0.5
+
+
+def read_layer_config(file_path: str) -> Dict:
+    """Read a route layer configuration file.
+
+    Args:
+        file_path: Path to the route layer JSON file.
+
+    Returns:
+        The route layer configuration as a dictionary.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    with open(file_path, "r") as file:
+        return json.load(file)
+
+
+def write_layer_config(file_path: str, config: Dict) -> None:
+    """Replace a route layer configuration file atomically.
+
+    Args:
+        file_path: Path to the route layer JSON file.
+        config: The route layer configuration.
+    """
+    with open(f"{file_path}.tmp", "w") as file:
+        json.dump(config, file, indent=4)
+    os.replace(f"{file_path}.tmp", file_path)
+
+
+@contextmanager
+def locked_layer(file_path: str):
+    """Hold an exclusive lock on a route layer file around a read-modify-write.
+
+    Args:
+        file_path: Path to the route layer JSON file.
+    """
+    with locked(f"{file_path}.lock"):
+        yield
+
+
+def layer_hash(file_path: str, encoder_name: str) -> str:
+    """Compute the key of the artifact compiled from a route layer file.
+
+    Args:
+        file_path: Path to the route layer JSON file.
+        encoder_name: Name of the encoder used to embed the utterances.
+
+    Returns:
+        Hex digest of the file contents and the encoder name.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        digest.update(file.read())
+    digest.update(encoder_name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _artifact_stem(
+    file_path: str, backend: Optional[str] = None, max_length: int = MAX_LENGTH
+) -> str:
+    """Return the file name prefix of the artifacts of a route layer and encoder.
+
+    Backend encoders truncate the utterances to `max_length` tokens, so each
+    sequence length gets its own artifact.
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return f"{stem}.{backend}.{max_length}" if backend else stem
+
+
+def _artifact_paths(
+    file_path: str,
+    key: str,
+    backend: Optional[str] = None,
+    max_length: int = MAX_LENGTH,
+):
+    """Return the embedding and metadata paths of an artifact."""
+    stem = _artifact_stem(file_path, backend, max_length)
+    prefix = os.path.join(ARTIFACT_DIR, f"{stem}-{key[:16]}")
+    return f"{prefix}.npy", f"{prefix}.json"
+
+
+def compile_router(
+    file_path: str,
+    encoder: Callable[[List[str]], List[List[float]]],
+    config: Optional[Dict] = None,
+    backend: Optional[str] = None,
+    max_length: int = MAX_LENGTH,
+) -> Dict:
+    """Encode every route utterance once and store the result as an artifact.
+
+    Args:
+        file_path: Path to the route layer JSON file.
+        encoder: Callable that encodes a list of texts into embeddings.
+        config: Already loaded route layer configuration, read from file if None.
+        backend: Encoder backend, e.g. "int8", whose artifact is kept apart from
+            the one of the default encoder. None for the default encoder.
+        max_length: Maximum number of tokens per utterance of a backend encoder.
+
+    Returns:
+        The metadata of the compiled artifact.
+    """
+    if config is None:
+        config = read_layer_config(file_path)
+
+    # Flatten the utterances of every route, in the order of the artifact rows
+    utterances = [
+        utterance for route in config["routes"] for utterance in route["utterances"]
+    ]
+
+    return write_artifact(file_path, config, encoder(utterances), backend, max_length)
+
+
+def write_artifact(
+    file_path: str,
+    config: Dict,
+    embeddings: np.ndarray,
+    backend: Optional[str] = None,
+    max_length: int = MAX_LENGTH,
+) -> Dict:
+    """Store already computed utterance embeddings as the artifact of a route layer.
+
+    Args:
+        file_path: Path to the route layer JSON file, as currently written.
+        config: The route layer configuration of the file.
+        embeddings: Embedding of every utterance, in the order of the routes and
+            of their utterances in `config`.
+        backend: Encoder backend of the embeddings, None for the default encoder.
+        max_length: Maximum number of tokens per utterance of a backend encoder.
+
+    Returns:
+        The metadata of the written artifact.
+    """
+    key = layer_hash(file_path, config["encoder_name"])
+    embeddings_path, metadata_path = _artifact_paths(
+        file_path, key, backend, max_length
+    )
+
+    utterance_routes = [
+        route["name"] for route in config["routes"] for _ in route["utterances"]
+    ]
+
+    # Normalize the utterances so scoring is a plain dot product
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings / np.maximum(norms, 1e-12)
+
+    metadata = {
+        "key": key,
+        "encoder_type": config["encoder_type"],
+        "encoder_name": config["encoder_name"],
+        "encoder_backend": backend,
+        "max_length": max_length if backend else None,
+        "route_names": [route["name"] for route in config["routes"]],
+        "thresholds": [
+            (
+                route.get("score_threshold")
+                if route.get("score_threshold") is not None
+                else DEFAULT_SCORE_THRESHOLD
+            )
+            for route in config["routes"]
+        ],
+        "utterance_routes": utterance_routes,
+    }
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+
+    # Write to temporary files first so readers never see a partial artifact
+    with open(f"{embeddings_path}.tmp", "wb") as file:
+        np.save(file, embeddings)
+    with open(f"{metadata_path}.tmp", "w") as file:
+        json.dump(metadata, file, indent=4)
+    os.replace(f"{embeddings_path}.tmp", embeddings_path)
+    os.replace(f"{metadata_path}.tmp", metadata_path)
+
+    _remove_stale_artifacts(file_path, key, backend, max_length)
+
+    return metadata
+
+
+def _remove_stale_artifacts(
+    file_path: str,
+    key: str,
+    backend: Optional[str] = None,
+    max_length: int = MAX_LENGTH,
+) -> None:
+    """Delete artifacts compiled from older versions of a route layer file."""
+    stem = _artifact_stem(file_path, backend, max_length)
+    current = os.path.basename(_artifact_paths(file_path, key, backend, max_length)[0])[
+        :-4
+    ]
+
+    for name in os.listdir(ARTIFACT_DIR):
+        base, ext = os.path.splitext(name)
+        if base.startswith(f"{stem}-") and base != current and ext in (".npy", ".json"):
+            try:
+                os.remove(os.path.join(ARTIFACT_DIR, name))
+            except OSError:
+                pass  # Another process may have removed it already
+
+
+def load_artifact(
+    file_path: str,
+    encoder_name: str,
+    backend: Optional[str] = None,
+    max_length: int = MAX_LENGTH,
+):
+    """Load the artifact compiled from the current version of a route layer file.
+
+    Args:
+        file_path: Path to the route layer JSON file.
+        encoder_name: Name of the encoder used to embed the utterances.
+        backend: Encoder backend the artifact was compiled with, None for the
+            default encoder.
+        max_length: Maximum number of tokens per utterance of a backend encoder.
+
+    Returns:
+        A tuple with the memory-mapped embedding matrix and the artifact metadata,
+        or None if no up-to-date artifact exists.
+    """
+    key = layer_hash(file_path, encoder_name)
+    embeddings_path, metadata_path = _artifact_paths(
+        file_path, key, backend, max_length
+    )
+
+    if not (os.path.exists(embeddings_path) and os.path.exists(metadata_path)):
+        return None
+
+    with open(metadata_path, "r") as file:
+        metadata = json.load(file)
+
+    # Guard against a truncated hash prefix colliding with another version
+    if metadata.get("key") != key:
+        return None
+
+    embeddings = np.load(embeddings_path, mmap_mode="r")
+    return embeddings, metadata
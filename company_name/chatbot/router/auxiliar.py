@@ -1,47 +1,165 @@
+import argparse
 import json
 import os
+import sys
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # Define the base directory for file operations
 BASE_DIR = os.path.dirname(__file__)
 
+# Size in bytes past which a write folds the log into the snapshot
+COMPACT_SIZE = 1024 * 1024
+
+# Labelled messages are stored as a JSON snapshot (`<name>.json`), which the
+# notebooks read, plus an append-only log of the messages added since the last
+# compaction (`<name>.log.jsonl`). The next free ID is persisted in `<name>.id`,
+# and every write holds an exclusive lock on `<name>.lock`.
+
+
+def _get_paths(file_name: str) -> Dict[str, str]:
+    """Return the paths of the snapshot, log, ID counter and lock files of a store."""
+    stem = os.path.splitext(os.path.join(BASE_DIR, file_name))[0]
+    return {
+        "snapshot": f"{stem}.json",
+        "log": f"{stem}.log.jsonl",
+        "counter": f"{stem}.id",
+        "lock": f"{stem}.lock",
+    }
+
+
+@contextmanager
+def locked(lock_path: str):
+    """Hold an exclusive lock on a file, shared by every process using the store."""
+    with open(lock_path, "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _iter_log(log_path: str, errors: Optional[List[str]] = None) -> Iterator[Dict]:
+    """Yield the messages of a log file, skipping the lines that cannot be decoded.
+
+    Args:
+        log_path: Path of the log file.
+        errors: List collecting the undecodable lines, if given.
+    """
+    if not os.path.exists(log_path):
+        return
+
+    with open(log_path, "r") as file:
+        for number, line in enumerate(file, start=1):
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # An interrupted write can leave a truncated line, keep the others
+                print(f"Skipping undecodable line {number} of {log_path}: {line!r}")
+                if errors is not None:
+                    errors.append(line)
+
+
+def _read_next_id(paths: Dict[str, str]) -> int:
+    """Read the next free ID, rebuilding the counter from the data if it is missing."""
+    if os.path.exists(paths["counter"]):
+        with open(paths["counter"], "r") as file:
+            return int(file.read().strip() or 1)
+
+    # First write with this version of the store: scan the existing data once
+    max_id = max(
+        (item.get("Id", 0) for item in _iter_stored(paths)),
+        default=0,
+    )
+    return max_id + 1
+
+
+def _write_next_id(paths: Dict[str, str], next_id: int) -> None:
+    """Persist the next free ID atomically."""
+    with open(f"{paths['counter']}.tmp", "w") as file:
+        file.write(str(next_id))
+    os.replace(f"{paths['counter']}.tmp", paths["counter"])
+
+
+def _iter_stored(
+    paths: Dict[str, str], errors: Optional[List[str]] = None
+) -> Iterator[Dict]:
+    """Yield the messages of the snapshot followed by those of the log.
+
+    Args:
+        paths: Paths of the files of the store.
+        errors: List collecting the undecodable lines of the log, if given.
+    """
+    max_id = 0
+
+    if os.path.exists(paths["snapshot"]):
+        with open(paths["snapshot"], "r") as file:
+            for item in json.load(file):
+                max_id = max(max_id, item.get("Id", 0))
+                yield item
+
+    # Skip log entries already in the snapshot, left by an interrupted compaction
+    for item in _iter_log(paths["log"], errors):
+        if item.get("Id", 0) > max_id:
+            yield item
+
 
 def add_message(new_item, file_name):
-    """Add a single message to a JSON file, assigning it a unique ID.
+    """Add a single message to a message store, assigning it a unique ID.
 
     Args:
         new_item: The message to add, provided as a dictionary.
         file_name: The name of the JSON file to store the messages.
     """
-    try:
-        file_path = os.path.join(BASE_DIR, file_name)
+    add_messages([new_item], file_name)
 
-        # Check if the file exists
-        if not os.path.exists(file_path):
-            # Assign an initial ID when creating a new file
-            new_item["Id"] = 1
-            data = [new_item]
 
-            # Write the data to a new file
-            with open(file_path, "w") as file:
-                json.dump(data, file, indent=4)
-        else:
-            # Load existing messages from the file
-            with open(file_path, "r") as file:
-                data = json.load(file)
-
-            # Determine the next ID based on existing data
-            if data:
-                max_id = max(item.get("Id", 0) for item in data)
-                new_item["Id"] = max_id + 1
-            else:
-                new_item["Id"] = 1  # Start from ID 1 if the file is empty
+def add_messages(new_items, file_name):
+    """Add multiple messages to a message store, assigning unique IDs to each.
+
+    The messages are appended to the log of the store, so the cost of a write does
+    not depend on how many messages are already stored.
+
+    Args:
+        new_items: A list of dictionaries representing the messages to add.
+        file_name: The name of the JSON file to store the messages.
+    """
+    paths = _get_paths(file_name)
+
+    try:
+        with locked(paths["lock"]):
+            # Assign unique IDs to each new item from the persisted counter
+            next_id = _read_next_id(paths)
+            for new_item in new_items:
+                new_item["Id"] = next_id
+                next_id += 1
+
+            # Persist the counter first, so a crash can only leave a gap in the IDs
+            _write_next_id(paths, next_id)
 
-            # Add the new message to the list
-            data.append(new_item)
+            # Append the new items to the log, one JSON object per line
+            with open(paths["log"], "a") as file:
+                file.write("".join(json.dumps(item) + "\n" for item in new_items))
+                file.flush()
+                os.fsync(file.fileno())
 
-            # Save the updated list back to the file
-            with open(file_path, "w") as file:
-                json.dump(data, file, indent=4)
+            # Fold a large log into the snapshot, so loads do not replay all of it
+            if os.path.getsize(paths["log"]) > COMPACT_SIZE:
+                _compact(paths, file_name)
 
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON from file {file_name}: {e}")
@@ -54,54 +172,93 @@ def add_message(new_item, file_name):
         raise
 
 
-def add_messages(new_items, file_name):
-    """Add multiple messages to a JSON file, assigning unique IDs to each.
+def iter_messages(file_name) -> Iterator[Dict]:
+    """Stream the messages of a message store, in insertion order.
 
     Args:
-        new_items: A list of dictionaries representing the messages to add.
-        file_name: The name of the JSON file to store the messages.
+        file_name: The name of the JSON file storing the messages.
+
+    Yields:
+        Each stored message as a dictionary.
     """
-    try:
-        file_path = os.path.join(BASE_DIR, file_name)
+    yield from _iter_stored(_get_paths(file_name))
 
-        # Check if the file exists
-        if not os.path.exists(file_path):
-            # Assign sequential IDs starting from 1 for a new file
-            for i, item in enumerate(new_items, 1):
-                item["Id"] = i
 
-            # Write all new items to a new file
-            with open(file_path, "w") as file:
-                json.dump(new_items, file, indent=4)
-        else:
-            # Load existing messages from the file
-            with open(file_path, "r") as file:
-                data = json.load(file)
+def load_messages(file_name) -> List[Dict]:
+    """Load every message of a message store.
 
-            # Determine the starting ID for the new items
-            if data:
-                max_id = max(item.get("Id", 0) for item in data)
-            else:
-                max_id = 0  # Start from ID 1 if the file is empty
+    Args:
+        file_name: The name of the JSON file storing the messages.
 
-            # Assign unique IDs to each new item
-            for new_item in new_items:
-                max_id += 1
-                new_item["Id"] = max_id
+    Returns:
+        The list of stored messages.
+    """
+    return list(iter_messages(file_name))
+
+
+def _compact(paths: Dict[str, str], file_name: str) -> None:
+    """Fold the log of a store into its snapshot, the caller holding the lock."""
+    if not os.path.exists(paths["log"]):
+        return
+
+    errors = []
+    data = list(_iter_stored(paths, errors))
 
-            # Add the new items to the existing data
-            data.extend(new_items)
+    # Keep the log for manual recovery rather than drop the lines it holds
+    if errors:
+        print(
+            f"Not compacting {file_name}: its log has {len(errors)} "
+            "undecodable line(s)"
+        )
+        return
 
-            # Save the updated data back to the file
-            with open(file_path, "w") as file:
-                json.dump(data, file, indent=4)
+    # Replace the snapshot atomically before truncating the log
+    with open(f"{paths['snapshot']}.tmp", "w") as file:
+        json.dump(data, file, indent=4)
+    os.replace(f"{paths['snapshot']}.tmp", paths["snapshot"])
+    os.remove(paths["log"])
+
+
+def compact(file_name):
+    """Fold the log of a message store into its JSON snapshot.
+
+    Writes compact the log once it grows past `COMPACT_SIZE` bytes. A log holding
+    undecodable lines is left untouched, so they can be recovered.
+
+    Args:
+        file_name: The name of the JSON file storing the messages.
+    """
+    paths = _get_paths(file_name)
+
+    try:
+        with locked(paths["lock"]):
+            _compact(paths, file_name)
 
     except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from file {file_path}: {e}")
+        print(f"Error decoding JSON from file {file_name}: {e}")
         raise
     except (IOError, OSError) as e:
-        print(f"Error accessing or writing to file {file_path}: {e}")
-        raise
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        print(f"Error accessing or writing to file {file_name}: {e}")
         raise
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Maintain the message stores.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact_parser = subparsers.add_parser(
+        "compact", help="Fold the log of message stores into their JSON snapshot."
+    )
+    compact_parser.add_argument(
+        "files",
+        nargs="+",
+        help="JSON files of the stores, relative to the router directory.",
+    )
+    args = parser.parse_args()
+
+    for file_name in args.files:
+        compact(file_name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from company_name.chatbot.metrics import get_metrics
+from company_name.chatbot.router.index import build_index
+
+# Number of nearest utterances considered per query, as in `RouteLayer._retrieve`
+TOP_K = 5
+
+
+class IntentClassifier:
+    """Vectorized intent classifier over the utterance embeddings of a route layer.
+
+    Scores many messages at once with a single encoder call and a nearest-utterance
+    search in a route index, reproducing the top-k and per-route threshold
+    semantics of `RouteLayer.retrieve_multiple_routes`. Small layers use an exact
+    brute-force index, large ones an approximate IVF index (see `build_index`).
+    """
+
+    def __init__(
+        self,
+        encoder: Callable[[List[str]], List[List[float]]],
+        embeddings: np.ndarray,
+        utterance_routes: Sequence[str],
+        route_names: Sequence[str],
+        thresholds: Sequence[float],
+        top_k: int = TOP_K,
+        normalized: bool = False,
+        index: str = "auto",
+    ):
+        """Initialize the classifier with an encoder and precomputed embeddings.
+
+        Args:
+            encoder: Callable that encodes a list of texts into embeddings.
+            embeddings: Matrix of utterance embeddings with shape (n_utterances, dim).
+            utterance_routes: Route name of each row of `embeddings`.
+            route_names: Names of the routes, in the order of `thresholds`.
+            thresholds: Score threshold of each route.
+            top_k: Number of nearest utterances used to score each query.
+            normalized: Whether `embeddings` already has unit-length rows, in which
+                case it is used as is (e.g. a memory-mapped artifact).
+            index: Kind of route index, "brute", "ivf" or "auto".
+        """
+        self.encoder = encoder
+        self.route_names = list(route_names)
+        self.thresholds = np.asarray(thresholds, dtype=np.float32)
+        self.top_k = top_k
+
+        # Normalize the utterance embeddings once so scoring is a plain dot product
+        if normalized:
+            self.embeddings = embeddings
+        else:
+            self.embeddings = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        self.index = build_index(self.embeddings, index)
+        self._lock = threading.Lock()
+
+        # Map each utterance to the position of its route
+        route_positions = {name: i for i, name in enumerate(self.route_names)}
+        self.utterance_routes = np.array(
+            [route_positions[name] for name in utterance_routes], dtype=np.intp
+        )
+
+    @classmethod
+    def from_route_layer(cls, route_layer, top_k: int = TOP_K) -> "IntentClassifier":
+        """Build a classifier from an already encoded `RouteLayer`.
+
+        Args:
+            route_layer: RouteLayer whose local index holds the utterance embeddings.
+            top_k: Number of nearest utterances used to score each query.
+
+        Returns:
+            An IntentClassifier sharing the encoder of the route layer.
+        """
+        route_names = [route.name for route in route_layer.routes]
+        thresholds = [
+            (
+                route.score_threshold
+                if route.score_threshold is not None
+                else route_layer.score_threshold
+            )
+            for route in route_layer.routes
+        ]
+
+        return cls(
+            encoder=route_layer.encoder,
+            embeddings=route_layer.index.index,
+            utterance_routes=route_layer.index.routes,
+            route_names=route_names,
+            thresholds=thresholds,
+            top_k=top_k,
+        )
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Scale each row of a matrix to unit length."""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode a list of texts in one encoder call.
+
+        Args:
+            texts: The texts to encode.
+
+        Returns:
+            Matrix of normalized embeddings with shape (len(texts), dim).
+        """
+        with get_metrics().timer("router_encode"):
+            vectors = np.asarray(self.encoder(list(texts)), dtype=np.float32)
+        return self._normalize(vectors.reshape(len(texts), -1))
+
+    def add_utterances(
+        self,
+        texts: List[str],
+        routes: Sequence[str],
+        vectors: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Insert labelled utterances into the live classifier.
+
+        Concurrent classifications keep working: they see the utterances either
+        before or after the insertion.
+
+        Args:
+            texts: The new utterances.
+            routes: The route of each utterance, which must already exist.
+            vectors: Embeddings of the utterances, encoded here if not given.
+
+        Returns:
+            The normalized embeddings of the utterances.
+
+        Raises:
+            ValueError: If a route does not exist.
+        """
+        unknown = set(routes) - set(self.route_names)
+        if unknown:
+            raise ValueError(f"Unknown routes: {sorted(unknown)}")
+
+        if vectors is None:
+            vectors = self.encode(texts)
+        else:
+            vectors = self._normalize(
+                np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+            )
+
+        positions = [self.route_names.index(route) for route in routes]
+
+        with self._lock:
+            # Extend the routes before the index, so searches never return an
+            # utterance whose route is unknown yet
+            self.utterance_routes = np.concatenate(
+                [self.utterance_routes, np.asarray(positions, dtype=np.intp)]
+            )
+            self.embeddings = np.concatenate([self.embeddings, vectors])
+            self.index.add(vectors)
+
+        return vectors
+
+    def score(self, vectors: np.ndarray) -> np.ndarray:
+        """Score query embeddings against every route.
+
+        A route scores the highest similarity among its utterances in the top-k
+        neighbours of the query, and routes not passing their threshold score -inf.
+
+        Args:
+            vectors: Matrix of normalized query embeddings with shape (n, dim).
+
+        Returns:
+            Matrix of route scores with shape (n, n_routes).
+        """
+        with get_metrics().timer("route_scoring"):
+            scores = self.route_scores(vectors)
+
+        # Discard routes whose best score does not pass their threshold
+        scores[scores <= self.thresholds] = -np.inf
+        return scores
+
+    def route_scores(self, vectors: np.ndarray) -> np.ndarray:
+        """Score query embeddings against every route, ignoring the thresholds."""
+        n_queries = vectors.shape[0]
+        index = self.index
+        top_k = min(self.top_k, len(index))
+
+        # Keep the top-k utterances per query, as in `RouteLayer._retrieve`
+        top_scores, top_idx = index.search(vectors, top_k)
+        top_routes = self.utterance_routes[top_idx]
+
+        # Keep the best score of each route among the neighbours
+        scores = np.full((n_queries, len(self.route_names)), -np.inf, dtype=np.float32)
+        rows = np.repeat(np.arange(n_queries), top_k)
+        np.maximum.at(scores, (rows, top_routes.ravel()), top_scores.ravel())
+        return scores
+
+    def rank_vectors(
+        self, vectors: np.ndarray, k: int = 2
+    ) -> List[List[Tuple[str, float]]]:
+        """Rank the candidate routes of already encoded queries.
+
+        Unlike `classify_vectors`, the thresholds are ignored, so the ranking also
+        covers queries no route matches.
+
+        Args:
+            vectors: Matrix of normalized query embeddings with shape (n, dim).
+            k: Maximum number of candidates per query.
+
+        Returns:
+            For each query, up to `k` (route name, score) pairs among the routes
+            found in its top-k neighbours, best first.
+        """
+        return self.classify_and_rank_vectors(vectors, k)[1]
+
+    def classify_vectors(self, vectors: np.ndarray) -> List[Optional[str]]:
+        """Classify already encoded queries.
+
+        Among the routes passing their threshold, the one with the highest score
+        wins. `RouteLayer.retrieve_multiple_routes` lists the matching routes in
+        the unsorted order of its top-k search instead, so when several routes
+        pass their threshold its first match may be another one.
+
+        Args:
+            vectors: Matrix of normalized query embeddings with shape (n, dim).
+
+        Returns:
+            The intent of each query, or None when no route passes its threshold.
+        """
+        return self.classify_and_rank_vectors(vectors, k=0)[0]
+
+    def classify_and_rank_vectors(
+        self, vectors: np.ndarray, k: int = 2
+    ) -> Tuple[List[Optional[str]], List[List[Tuple[str, float]]]]:
+        """Classify already encoded queries and rank their candidate routes.
+
+        The route index is searched once for both results.
+
+        Args:
+            vectors: Matrix of normalized query embeddings with shape (n, dim).
+            k: Maximum number of candidates per query, 0 to skip the ranking.
+
+        Returns:
+            The intent of each query as in `classify_vectors`, and its candidates
+            as in `rank_vectors`.
+        """
+        if vectors.shape[0] == 0:
+            return [], []
+
+        with get_metrics().timer("route_scoring"):
+            scores = self.route_scores(vectors)
+
+        # Best route passing its threshold
+        passed = np.where(scores > self.thresholds, scores, -np.inf)
+        best = passed.argmax(axis=1)
+        matched = np.isfinite(passed[np.arange(len(best)), best])
+        intents = [
+            self.route_names[route] if is_matched else None
+            for route, is_matched in zip(best, matched)
+        ]
+
+        # Best routes regardless of the thresholds
+        order = np.argsort(-scores, axis=1)[:, :k]
+        candidates = [
+            [
+                (self.route_names[route], float(row_scores[route]))
+                for route in row_order
+                if np.isfinite(row_scores[route])
+            ]
+            for row_scores, row_order in zip(scores, order)
+        ]
+
+        return intents, candidates
+
+    def classify_batch(self, texts: List[str]) -> List[Optional[str]]:
+        """Classify many texts with one encoder call and one matrix multiply.
+
+        Args:
+            texts: The texts to classify.
+
+        Returns:
+            The intent of each text, or None when no route passes its threshold.
+        """
+        if not texts:
+            return []
+
+        return self.classify_vectors(self.encode(texts))
+
+    def classify(self, text: str) -> Optional[str]:
+        """Classify a single text.
+
+        Args:
+            text: The text to classify.
+
+        Returns:
+            The intent of the text, or None when no route passes its threshold.
+        """
+        return self.classify_batch([text])[0]
@@ -0,0 +1,104 @@
+from typing import List, Optional
+
+import numpy as np
+
+# Backends of the sentence encoder, selectable in `load_intention_classifier`
+ENCODER_BACKENDS = ("fp32", "int8")
+
+# Chat messages are short, so longer inputs are truncated to this many tokens
+MAX_LENGTH = 64
+
+# Number of texts encoded per forward pass
+BATCH_SIZE = 64
+
+
+class TransformerEncoder:
+    """Sentence encoder running a Hugging Face model on CPU with torch.
+
+    Reproduces the mean pooling and normalization of the semantic-router
+    `HuggingFaceEncoder`, with control over the precision, the number of intra-op
+    threads and the maximum sequence length. The "int8" backend applies dynamic
+    quantization to the linear layers, which hold most of the compute of a
+    MiniLM-sized model. The model is loaded the first time the encoder is called.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backend: str = "fp32",
+        threads: Optional[int] = None,
+        max_length: int = MAX_LENGTH,
+        batch_size: int = BATCH_SIZE,
+    ):
+        """Store the encoder settings without loading the model.
+
+        Args:
+            name: Name of the Hugging Face model.
+            backend: "fp32" for full precision, "int8" for dynamic quantization.
+            threads: Number of intra-op threads of torch, left unchanged if None.
+                This is a process-wide setting.
+            max_length: Maximum number of tokens per text.
+            batch_size: Number of texts encoded per forward pass.
+
+        Raises:
+            ValueError: If the backend is unknown.
+        """
+        if backend not in ENCODER_BACKENDS:
+            raise ValueError(
+                f"Unknown encoder backend {backend!r}, expected one of {ENCODER_BACKENDS}"
+            )
+
+        self.name = name
+        self.backend = backend
+        self.threads = threads
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self._tokenizer = None
+        self._model = None
+
+    def _load(self) -> None:
+        """Load the tokenizer and the model, quantizing it for the int8 backend."""
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+
+        tokenizer = AutoTokenizer.from_pretrained(self.name)
+        model = AutoModel.from_pretrained(self.name).eval()
+        if self.backend == "int8":
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+        self._tokenizer, self._model = tokenizer, model
+
+    def __call__(self, docs: List[str]) -> np.ndarray:
+        import torch
+
+        if self._model is None:
+            self._load()
+
+        batches = []
+        with torch.inference_mode():
+            for offset in range(0, len(docs), self.batch_size):
+                inputs = self._tokenizer(
+                    docs[offset : offset + self.batch_size],
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_length,
+                    return_tensors="pt",
+                )
+                token_embeddings = self._model(**inputs).last_hidden_state
+
+                # Mean pooling over the tokens that are not padding
+                mask = inputs["attention_mask"].unsqueeze(-1).float()
+                pooled = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(
+                    min=1e-9
+                )
+                pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+                batches.append(pooled.numpy())
+
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(batches).astype(np.float32, copy=False)
@@ -0,0 +1,418 @@
+"""
+Evaluation and latency benchmark of the intent router.
+
+Loads labelled messages from the message stores, builds or loads the compiled
+route layer and reports the accuracy, the per-intent precision and recall and
+the confusion matrix on the held-out messages the layer was not trained on, and
+the classification throughput and latency percentiles at several batch sizes.
+With an encoder backend, the routing accuracy is also checked against a
+reference backend, and the run fails when it drops by more than the tolerance.
+
+Usage:
+    python -m company_name.chatbot.router.evaluate [--layer PATH]
+        [--split {test,train,all} | --data FILE ...] [--batch-sizes 1,8,32,128]
+        [--repeat N] [--backend {fp32,int8}] [--threads N] [--max-length N]
+        [--reference {fp32,int8}] [--tolerance FRACTION] [--index {auto,brute,ivf}]
+        [--output PATH] [--json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from company_name.chatbot.router.artifact import read_layer_config
+from company_name.chatbot.router.auxiliar import iter_messages
+from company_name.chatbot.router.classifier import IntentClassifier
+from company_name.chatbot.router.encoders import ENCODER_BACKENDS, MAX_LENGTH
+from company_name.chatbot.router.index import INDEX_KINDS
+
+# Message stores the route layer is trained on
+DEFAULT_DATA = ["synthetic_intetions.json", "new_intentions.json"]
+
+# Store split into training and held-out messages, with the test fraction and
+# seed of the split made by the training notebook
+SPLIT_DATA = "synthetic_intetions.json"
+TEST_SIZE = 0.1
+SPLIT_SEED = 0
+
+# Splits of the labelled messages, selectable in `load_split`
+SPLITS = ("test", "train", "all")
+
+# Batch sizes of the latency benchmark
+DEFAULT_BATCH_SIZES = [1, 8, 32, 128]
+
+# Allowed accuracy drop of an encoder backend against the reference backend
+ACCURACY_TOLERANCE = 0.02
+
+# Label of the messages that no route should match
+NO_INTENT = "None"
+
+
+def load_dataset(file_names: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """Load the labelled messages of message stores.
+
+    Args:
+        file_names: Names of the message stores in the router folder.
+
+    Returns:
+        The messages and their intent labels, "None" for no intent.
+    """
+    messages, labels = [], []
+    for file_name in file_names:
+        for item in iter_messages(file_name):
+            messages.append(item["Message"])
+            labels.append(item["Intention"] or NO_INTENT)
+    return messages, labels
+
+
+def load_split(split: str, layer_path: str) -> Tuple[List[str], List[str]]:
+    """Load the training or held-out labelled messages of a route layer.
+
+    The synthetic messages are split as in `train_evaluate_router.ipynb` when
+    scikit-learn is installed; without it, every synthetic message that is not
+    an utterance of the layer is held out, including the no-intent ones. The
+    other stores are only used for training. Utterances of the layer, e.g.
+    added by the live router, are never held out.
+
+    Args:
+        split: "test" for the held-out messages, "train" for the others, "all"
+            for every message of the default stores.
+        layer_path: Path to the route layer JSON file.
+
+    Returns:
+        The messages and their intent labels, "None" for no intent.
+
+    Raises:
+        ValueError: If the split is unknown.
+    """
+    if split not in SPLITS:
+        raise ValueError(f"Unknown split {split!r}, expected one of {SPLITS}")
+    if split == "all":
+        return load_dataset(DEFAULT_DATA)
+
+    messages, labels = load_dataset([SPLIT_DATA])
+    held_out = np.ones(len(messages), dtype=bool)
+    try:
+        from sklearn.model_selection import train_test_split
+    except ImportError:
+        pass  # Only the utterances of the layer are known to be trained on
+    else:
+        _, test_rows = train_test_split(
+            np.arange(len(messages)),
+            test_size=TEST_SIZE,
+            random_state=SPLIT_SEED,
+            stratify=labels,
+        )
+        held_out[:] = False
+        held_out[test_rows] = True
+
+    utterances = {
+        text
+        for route in read_layer_config(layer_path)["routes"]
+        for text in route["utterances"]
+    }
+    held_out &= np.array([message not in utterances for message in messages])
+
+    if split == "test":
+        rows = np.flatnonzero(held_out)
+        return [messages[i] for i in rows], [labels[i] for i in rows]
+
+    rows = np.flatnonzero(~held_out)
+    other_messages, other_labels = load_dataset(
+        [name for name in DEFAULT_DATA if name != SPLIT_DATA]
+    )
+    return (
+        [messages[i] for i in rows] + other_messages,
+        [labels[i] for i in rows] + other_labels,
+    )
+
+
+def evaluate(
+    classifier: IntentClassifier,
+    messages: List[str],
+    labels: List[str],
+    vectors: Optional[np.ndarray] = None,
+) -> Dict:
+    """Measure the quality of the router on labelled messages.
+
+    Args:
+        classifier: The intent classifier to evaluate.
+        messages: The messages to classify.
+        labels: The expected intent of each message, "None" for no intent.
+        vectors: Embeddings of the messages, encoded here if not given.
+
+    Returns:
+        The accuracy, the per-intent precision, recall and support, and the
+        confusion matrix as nested dictionaries of expected -> predicted counts.
+    """
+    if vectors is None:
+        vectors = classifier.encode(messages)
+
+    predictions = [
+        intent or NO_INTENT for intent in classifier.classify_vectors(vectors)
+    ]
+    intents = sorted(set(labels) | set(predictions))
+
+    confusion = {
+        expected: {predicted: 0 for predicted in intents} for expected in intents
+    }
+    for expected, predicted in zip(labels, predictions):
+        confusion[expected][predicted] += 1
+
+    per_intent = {}
+    for intent in intents:
+        true_positives = confusion[intent][intent]
+        predicted = sum(confusion[expected][intent] for expected in intents)
+        support = sum(confusion[intent].values())
+        per_intent[intent] = {
+            "precision": true_positives / predicted if predicted else 0.0,
+            "recall": true_positives / support if support else 0.0,
+            "support": support,
+        }
+
+    correct = sum(
+        expected == predicted for expected, predicted in zip(labels, predictions)
+    )
+    return {
+        "messages": len(messages),
+        "accuracy": correct / len(messages) if messages else 0.0,
+        "per_intent": per_intent,
+        "confusion": confusion,
+    }
+
+
+def check_accuracy(
+    classifier: IntentClassifier,
+    reference: IntentClassifier,
+    messages: List[str],
+    labels: List[str],
+    tolerance: float = ACCURACY_TOLERANCE,
+) -> Dict:
+    """Check that a classifier routes about as accurately as a reference one.
+
+    Args:
+        classifier: The classifier under test, e.g. with the int8 backend.
+        reference: The reference classifier, e.g. with the fp32 backend.
+        messages: The messages to classify.
+        labels: The expected intent of each message, "None" for no intent.
+        tolerance: Allowed accuracy drop against the reference.
+
+    Returns:
+        Both accuracies, the drop, the tolerance and whether the check passed.
+    """
+    accuracy = evaluate(classifier, messages, labels)["accuracy"]
+    reference_accuracy = evaluate(reference, messages, labels)["accuracy"]
+    drop = reference_accuracy - accuracy
+
+    return {
+        "accuracy": accuracy,
+        "reference_accuracy": reference_accuracy,
+        "drop": drop,
+        "tolerance": tolerance,
+        "passed": drop <= tolerance,
+    }
+
+
+def benchmark(
+    classifier: IntentClassifier,
+    messages: List[str],
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    repeat: int = 3,
+) -> Dict[int, Dict]:
+    """Measure the classification speed of the router at several batch sizes.
+
+    Each batch goes through `classify_batch`, i.e. one encoder call and one
+    scoring pass, as in production.
+
+    Args:
+        classifier: The intent classifier to benchmark.
+        messages: The messages to classify.
+        batch_sizes: Number of messages classified per call.
+        repeat: Number of passes over the messages per batch size.
+
+    Returns:
+        For each batch size, the throughput in messages per second and the
+        p50/p95/p99 latency of one call, in seconds.
+    """
+    results = {}
+
+    # Warm up the encoder, so model loading is not measured
+    classifier.classify_batch(messages[:1])
+
+    for batch_size in batch_sizes:
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for offset in range(0, len(messages), batch_size):
+                batch_start = time.perf_counter()
+                classifier.classify_batch(messages[offset : offset + batch_size])
+                latencies.append(time.perf_counter() - batch_start)
+        elapsed = time.perf_counter() - start
+
+        results[batch_size] = {
+            "throughput": len(messages) * repeat / elapsed if elapsed else 0.0,
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99)),
+        }
+
+    return results
+
+
+def main() -> int:
+    from company_name.chatbot.router.loader import FILE_PATH, load_intention_classifier
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--layer",
+        default=FILE_PATH,
+        help="Route layer JSON file (default: layer.json).",
+    )
+    parser.add_argument(
+        "--split",
+        choices=SPLITS,
+        default="test",
+        help="Split of the default stores to evaluate on (default: test, held out).",
+    )
+    parser.add_argument(
+        "--data",
+        nargs="+",
+        help="Message stores to evaluate on in full, instead of --split.",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        default=",".join(map(str, DEFAULT_BATCH_SIZES)),
+        help="Comma-separated batch sizes of the latency benchmark.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Passes per batch size (default: 3)."
+    )
+    parser.add_argument(
+        "--backend",
+        choices=ENCODER_BACKENDS,
+        help="Encoder backend (default: the encoder of the layer).",
+    )
+    parser.add_argument(
+        "--threads", type=int, help="Intra-op threads of the encoder backend."
+    )
+    parser.add_argument(
+        "--max-length",
+        type=int,
+        default=MAX_LENGTH,
+        help=f"Maximum tokens per message of the encoder backend (default: {MAX_LENGTH}).",
+    )
+    parser.add_argument(
+        "--reference",
+        choices=ENCODER_BACKENDS,
+        default="fp32",
+        help="Backend the accuracy of --backend is checked against (default: fp32).",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=ACCURACY_TOLERANCE,
+        help=f"Allowed accuracy drop against the reference (default: {ACCURACY_TOLERANCE}).",
+    )
+    parser.add_argument(
+        "--index",
+        choices=INDEX_KINDS,
+        default="auto",
+        help="Route index (default: auto, exact for small layers).",
+    )
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    parser.add_argument(
+        "--json", action="store_true", help="Print the results as JSON."
+    )
+    args = parser.parse_args()
+
+    classifier = load_intention_classifier(
+        args.layer,
+        args.backend,
+        threads=args.threads,
+        max_length=args.max_length,
+        index=args.index,
+    )
+    if args.data:
+        messages, labels = load_dataset(args.data)
+        speed_messages = messages
+    else:
+        messages, labels = load_split(args.split, args.layer)
+        # The held-out split is small, so the speed is measured on every message
+        speed_messages = load_dataset(DEFAULT_DATA)[0]
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    results = {
+        "layer": args.layer,
+        "data": args.data or args.split,
+        "backend": args.backend,
+        "index": args.index,
+        "quality": evaluate(classifier, messages, labels),
+        "speed": benchmark(classifier, speed_messages, batch_sizes, args.repeat),
+    }
+
+    if args.backend and args.backend != args.reference:
+        reference = load_intention_classifier(
+            args.layer,
+            args.reference,
+            threads=args.threads,
+            max_length=args.max_length,
+            index=args.index,
+        )
+        # Always checked on the held-out messages, which the layer was not
+        # trained on
+        results["accuracy_check"] = check_accuracy(
+            classifier,
+            reference,
+            *load_split("test", args.layer),
+            tolerance=args.tolerance,
+        )
+    passed = results.get("accuracy_check", {}).get("passed", True)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return 0 if passed else 1
+
+    quality = results["quality"]
+    print(f"Accuracy: {quality['accuracy']:.3f} on {quality['messages']} messages")
+    print(f"{'intent':22} {'precision':>9} {'recall':>7} {'support':>8}")
+    for intent, scores in quality["per_intent"].items():
+        print(
+            f"{intent:22} {scores['precision']:9.3f} {scores['recall']:7.3f} "
+            f"{scores['support']:8d}"
+        )
+
+    intents = list(quality["confusion"])
+    print("\nConfusion matrix (rows: expected, columns: predicted)")
+    print(" " * 22 + "".join(f"{intent[:10]:>11}" for intent in intents))
+    for expected in intents:
+        row = quality["confusion"][expected]
+        print(f"{expected:22}" + "".join(f"{row[p]:11d}" for p in intents))
+
+    print(f"\n{'batch':>6} {'msg/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for batch_size, speed in results["speed"].items():
+        print(
+            f"{batch_size:6d} {speed['throughput']:9.1f} {speed['p50'] * 1000:9.2f} "
+            f"{speed['p95'] * 1000:9.2f} {speed['p99'] * 1000:9.2f}"
+        )
+
+    if "accuracy_check" in results:
+        check = results["accuracy_check"]
+        print(
+            f"\n{'PASSED' if passed else 'FAILED'} accuracy check: {args.backend} "
+            f"{check['accuracy']:.3f} vs {args.reference} "
+            f"{check['reference_accuracy']:.3f} (tolerance {check['tolerance']})"
+        )
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""
+Vectorized fitting of the per-route score thresholds of the intent router.
+
+The training messages are encoded once, and their embeddings are cached next to
+the compiled artifacts, so refits with the same messages and encoder skip the
+encoder entirely. The threshold-free route scores of every message are computed
+in one pass, and the thresholds are searched by coordinate ascent: for each
+route, the accuracy of every candidate threshold is computed at once from the
+messages sorted by score. The thresholds are fitted on the training split of the
+layer and the accuracy is reported on its held-out split, before and after the
+fit. The fitted thresholds are written back to the route layer and its artifact.
+
+Usage:
+    python -m company_name.chatbot.router.fit [--layer PATH] [--data FILE ...]
+        [--backend {fp32,int8}] [--max-iter N] [--dry-run] [--json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from company_name.chatbot.router.artifact import (
+    ARTIFACT_DIR,
+    load_artifact,
+    locked_layer,
+    read_layer_config,
+    write_artifact,
+    write_layer_config,
+)
+from company_name.chatbot.router.classifier import IntentClassifier
+from company_name.chatbot.router.encoders import ENCODER_BACKENDS, MAX_LENGTH
+from company_name.chatbot.router.evaluate import NO_INTENT, load_dataset, load_split
+
+
+def encode_cached(
+    classifier: IntentClassifier, messages: List[str], encoder_key: str
+) -> np.ndarray:
+    """Encode training messages, reusing the embeddings of a previous fit.
+
+    Args:
+        classifier: The classifier whose encoder embeds the messages.
+        messages: The training messages.
+        encoder_key: Name of the encoder and backend, part of the cache key.
+
+    Returns:
+        Matrix of normalized embeddings with shape (len(messages), dim).
+    """
+    digest = hashlib.sha256(encoder_key.encode("utf-8"))
+    for message in messages:
+        digest.update(message.encode("utf-8") + b"\0")
+    path = os.path.join(ARTIFACT_DIR, f"fit-{digest.hexdigest()[:16]}.npy")
+
+    if os.path.exists(path):
+        return np.load(path)
+
+    vectors = classifier.encode(messages)
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    with open(f"{path}.tmp", "wb") as file:
+        np.save(file, vectors)
+    os.replace(f"{path}.tmp", path)
+
+    return vectors
+
+
+def _predict(scores: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    """Return the best route passing its threshold per row, or -1 for none."""
+    masked = np.where(scores > thresholds, scores, -np.inf)
+    best = masked.argmax(axis=1)
+    matched = np.isfinite(masked[np.arange(len(best)), best])
+    return np.where(matched, best, -1)
+
+
+def _targets(classifier: IntentClassifier, labels: List[str]) -> np.ndarray:
+    """Return the route position of each label, -1 for no intent."""
+    # Labels of unknown routes can never be predicted, so they count as errors
+    positions = {name: i for i, name in enumerate(classifier.route_names)}
+    return np.array(
+        [-1 if label == NO_INTENT else positions.get(label, -2) for label in labels]
+    )
+
+
+def _candidates(column: np.ndarray) -> np.ndarray:
+    """Return thresholds splitting the scores of a route at every distinct value."""
+    values = np.unique(column[np.isfinite(column)])
+    if values.size == 0:
+        return np.zeros(1, dtype=np.float32)
+
+    # Midpoints keep a margin on both sides of the split
+    candidates = np.concatenate(
+        [[values[0] - 0.01], (values[:-1] + values[1:]) / 2, [values[-1]]]
+    )
+    return np.clip(candidates, 0.0, 1.0).astype(np.float32)
+
+
+def fit_thresholds(
+    scores: np.ndarray,
+    targets: np.ndarray,
+    thresholds: Sequence[float],
+    max_iter: int = 10,
+) -> np.ndarray:
+    """Search the per-route thresholds maximizing the accuracy.
+
+    Each iteration updates every route in turn, keeping the other thresholds
+    fixed, and stops early once no route improves.
+
+    Args:
+        scores: Threshold-free route scores, with shape (n_messages, n_routes).
+        targets: Expected route position of each message, -1 for no intent.
+        thresholds: Initial threshold of each route.
+        max_iter: Maximum number of passes over the routes.
+
+    Returns:
+        The fitted thresholds.
+    """
+    thresholds = np.array(thresholds, dtype=np.float32)
+    rows = np.arange(scores.shape[0])
+    best_correct = int((_predict(scores, thresholds) == targets).sum())
+
+    for _ in range(max_iter):
+        improved = False
+
+        for route in range(scores.shape[1]):
+            # Best other route of each message, with the current thresholds
+            others = np.where(scores > thresholds, scores, -np.inf)
+            others[:, route] = -np.inf
+            other_best = others.argmax(axis=1)
+            other_scores = others[rows, other_best]
+            other_predictions = np.where(np.isfinite(other_scores), other_best, -1)
+
+            # A message changes from the other prediction to this route when its
+            # score passes the threshold and beats the other routes
+            column = scores[:, route]
+            other_correct = other_predictions == targets
+            gains = np.where(
+                column > other_scores,
+                (targets == route).astype(np.int64) - other_correct,
+                0,
+            )
+
+            # Accuracy of every candidate threshold at once, from the suffix sums
+            # of the gains of the messages sorted by score
+            order = np.argsort(column, kind="stable")
+            suffix = np.concatenate([np.cumsum(gains[order][::-1])[::-1], [0]])
+            candidates = _candidates(column)
+            passed = np.searchsorted(column[order], candidates, side="right")
+            correct = other_correct.sum() + suffix[passed]
+
+            best = int(correct.argmax())
+            if correct[best] > best_correct:
+                best_correct = int(correct[best])
+                thresholds[route] = candidates[best]
+                improved = True
+
+        if not improved:
+            break
+
+    return thresholds
+
+
+def save_thresholds(
+    thresholds: Dict[str, float],
+    file_path: str,
+    backend: Optional[str] = None,
+    max_length: int = MAX_LENGTH,
+) -> None:
+    """Write fitted thresholds to a route layer file and its compiled artifact.
+
+    The artifact is rewritten from its current embeddings, so no utterance is
+    encoded again. Without an up-to-date artifact, the next load compiles it.
+
+    Args:
+        thresholds: Fitted threshold of each route.
+        file_path: Path to the route layer JSON file.
+        backend: Encoder backend of the artifact, defaults to the
+            `encoder_backend` of the layer.
+        max_length: Maximum number of tokens per utterance of a backend encoder.
+    """
+    with locked_layer(file_path):
+        config = read_layer_config(file_path)
+        backend = backend or config.get("encoder_backend")
+        artifact = load_artifact(file_path, config["encoder_name"], backend, max_length)
+
+        for route in config["routes"]:
+            if route["name"] in thresholds:
+                route["score_threshold"] = round(float(thresholds[route["name"]]), 4)
+
+        write_layer_config(file_path, config)
+
+        if artifact is not None:
+            write_artifact(
+                file_path, config, np.asarray(artifact[0]), backend, max_length
+            )
+
+
+def fit(
+    classifier: IntentClassifier,
+    messages: List[str],
+    labels: List[str],
+    encoder_key: str,
+    max_iter: int = 10,
+    test_messages: Optional[List[str]] = None,
+    test_labels: Optional[List[str]] = None,
+) -> Dict:
+    """Fit the thresholds of a classifier on labelled messages.
+
+    Args:
+        classifier: The classifier to fit, whose thresholds are updated in place.
+        messages: The training messages.
+        labels: The expected intent of each message, "None" for no intent.
+        encoder_key: Name of the encoder and backend, part of the cache key.
+        max_iter: Maximum number of passes over the routes.
+        test_messages: The held-out messages the accuracy is measured on,
+            the training messages if not given.
+        test_labels: The expected intent of each held-out message.
+
+    Returns:
+        The accuracy before and after the fit, and the fitted thresholds.
+    """
+    vectors = encode_cached(classifier, messages, encoder_key)
+    scores = classifier.route_scores(vectors)
+    targets = _targets(classifier, labels)
+
+    if test_messages is None:
+        test_messages, test_scores, test_targets = messages, scores, targets
+    else:
+        test_vectors = encode_cached(classifier, test_messages, encoder_key)
+        test_scores = classifier.route_scores(test_vectors)
+        test_targets = _targets(classifier, test_labels)
+
+    before = float(
+        (_predict(test_scores, classifier.thresholds) == test_targets).mean()
+    )
+    thresholds = fit_thresholds(scores, targets, classifier.thresholds, max_iter)
+    after = float((_predict(test_scores, thresholds) == test_targets).mean())
+
+    classifier.thresholds = thresholds
+
+    return {
+        "messages": len(messages),
+        "test_messages": len(test_messages),
+        "accuracy_before": before,
+        "accuracy_after": after,
+        "thresholds": {
+            name: float(threshold)
+            for name, threshold in zip(classifier.route_names, thresholds)
+        },
+    }
+
+
+def main() -> int:
+    from company_name.chatbot.router.loader import FILE_PATH, load_intention_classifier
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--layer",
+        default=FILE_PATH,
+        help="Route layer JSON file (default: layer.json).",
+    )
+    parser.add_argument(
+        "--data",
+        nargs="+",
+        help="Message stores to fit on (default: the training split of the layer).",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=ENCODER_BACKENDS,
+        help="Encoder backend (default: the encoder of the layer).",
+    )
+    parser.add_argument(
+        "--max-iter",
+        type=int,
+        default=10,
+        help="Maximum passes over the routes (default: 10).",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report the fitted thresholds without writing them.",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the results as JSON."
+    )
+    args = parser.parse_args()
+
+    config = read_layer_config(args.layer)
+    backend = args.backend or config.get("encoder_backend")
+    classifier = load_intention_classifier(args.layer, backend)
+    if args.data:
+        messages, labels = load_dataset(args.data)
+    else:
+        messages, labels = load_split("train", args.layer)
+    test_messages, test_labels = load_split("test", args.layer)
+
+    results = fit(
+        classifier,
+        messages,
+        labels,
+        encoder_key=f"{config['encoder_name']}:{backend}",
+        max_iter=args.max_iter,
+        test_messages=test_messages,
+        test_labels=test_labels,
+    )
+    if not args.dry_run:
+        save_thresholds(results["thresholds"], args.layer, backend)
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return 0
+
+    print(
+        f"Held-out accuracy on {results['test_messages']} messages, fitted on "
+        f"{results['messages']}: "
+        f"{results['accuracy_before']:.3f} -> {results['accuracy_after']:.3f}"
+    )
+    for name, threshold in results["thresholds"].items():
+        print(f"{name:22} {threshold:.4f}")
+    if args.dry_run:
+        print("Dry run, the route layer was not changed.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
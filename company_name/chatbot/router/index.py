@@ -0,0 +1,228 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Index kinds, selectable in `IntentClassifier`
+INDEX_KINDS = ("auto", "brute", "ivf")
+
+# Below this many utterances the "auto" index is an exact brute-force search
+IVF_MIN_SIZE = 20000
+
+# Number of inverted lists probed per query by the IVF index
+N_PROBE = 8
+
+# Maximum number of utterances the IVF centroids are trained on
+TRAIN_SIZE = 50000
+
+# Number of rows scored at once when assigning utterances to their list
+CHUNK_SIZE = 8192
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row of a matrix to unit length."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class BruteForceIndex:
+    """Exact nearest-utterance search with one matrix multiply per batch."""
+
+    def __init__(self, embeddings: np.ndarray):
+        """Initialize the index.
+
+        Args:
+            embeddings: Matrix of normalized utterance embeddings (n, dim).
+        """
+        self.embeddings = embeddings
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Append utterances, numbered after the existing ones.
+
+        Args:
+            vectors: Matrix of normalized utterance embeddings (n_new, dim).
+        """
+        # Swap in a new matrix, so concurrent searches see the old or new one whole
+        self.embeddings = np.concatenate([self.embeddings, vectors])
+
+    def search(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the k most similar utterances of each query.
+
+        Args:
+            vectors: Matrix of normalized query embeddings (n_queries, dim).
+            k: Number of neighbours, at most the number of utterances.
+
+        Returns:
+            The similarities and utterance indices of the neighbours, both with
+            shape (n_queries, k), in no particular order.
+        """
+        similarities = vectors @ self.embeddings.T
+        top_idx = np.argpartition(similarities, -k, axis=1)[:, -k:]
+        return np.take_along_axis(similarities, top_idx, axis=1), top_idx
+
+
+class IVFIndex:
+    """Approximate nearest-utterance search over an inverted file index.
+
+    The utterances are clustered by spherical k-means, and stored grouped by
+    cluster so each inverted list is a contiguous block. A query only scores the
+    utterances of the `n_probe` clusters whose centroid is closest, which keeps
+    the cost roughly proportional to the square root of the number of utterances.
+    Utterances added after the build are kept in a small block scored by every
+    query, until the index is rebuilt.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        n_lists: Optional[int] = None,
+        n_probe: int = N_PROBE,
+        iterations: int = 10,
+        seed: int = 0,
+    ):
+        """Cluster the utterances and build the inverted lists.
+
+        Args:
+            embeddings: Matrix of normalized utterance embeddings (n, dim).
+            n_lists: Number of clusters, about sqrt(n) if None.
+            n_probe: Number of clusters scored per query.
+            iterations: Number of k-means iterations.
+            seed: Seed of the k-means sampling and initialization.
+        """
+        n = embeddings.shape[0]
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        self.n_probe = min(n_probe, self.n_lists)
+        self.centroids = self._train(embeddings, iterations, seed)
+
+        # Group the utterances by cluster, remembering their original position
+        assignments = self._assign(embeddings)
+        self.order = np.argsort(assignments, kind="stable")
+        self.vectors = np.ascontiguousarray(embeddings[self.order], dtype=np.float32)
+        self.offsets = np.searchsorted(
+            assignments[self.order], np.arange(self.n_lists + 1)
+        )
+
+        # Utterances added since the build, with their original positions
+        self.added = (
+            np.zeros((0, embeddings.shape[1]), dtype=np.float32),
+            np.zeros(0, dtype=np.intp),
+        )
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0] + self.added[0].shape[0]
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Append utterances, numbered after the existing ones.
+
+        Args:
+            vectors: Matrix of normalized utterance embeddings (n_new, dim).
+        """
+        added_vectors, added_ids = self.added
+        ids = np.arange(len(self), len(self) + vectors.shape[0])
+
+        # Swap in a new tuple, so concurrent searches see the old or new one whole
+        self.added = (
+            np.concatenate([added_vectors, np.asarray(vectors, dtype=np.float32)]),
+            np.concatenate([added_ids, ids]),
+        )
+
+    def _train(self, embeddings: np.ndarray, iterations: int, seed: int) -> np.ndarray:
+        """Fit the cluster centroids by spherical k-means on a sample."""
+        rng = np.random.default_rng(seed)
+        n = embeddings.shape[0]
+        sample = np.asarray(
+            embeddings[np.sort(rng.choice(n, min(n, TRAIN_SIZE), replace=False))],
+            dtype=np.float32,
+        )
+
+        centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)]
+        for _ in range(iterations):
+            labels = (sample @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+
+            # Keep the previous centroid of a cluster left empty
+            empty = np.bincount(labels, minlength=self.n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        return centroids
+
+    def _assign(self, embeddings: np.ndarray) -> np.ndarray:
+        """Return the closest cluster of every utterance, scored in chunks."""
+        return np.concatenate(
+            [
+                (embeddings[start : start + CHUNK_SIZE] @ self.centroids.T).argmax(
+                    axis=1
+                )
+                for start in range(0, embeddings.shape[0], CHUNK_SIZE)
+            ]
+        )
+
+    def search(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Find approximately the k most similar utterances of each query.
+
+        Args:
+            vectors: Matrix of normalized query embeddings (n_queries, dim).
+            k: Number of neighbours.
+
+        Returns:
+            The similarities and utterance indices of the neighbours, both with
+            shape (n_queries, k), in no particular order. When the probed
+            clusters hold fewer than k utterances, the missing neighbours have a
+            similarity of -inf.
+        """
+        top_scores = np.full((vectors.shape[0], k), -np.inf, dtype=np.float32)
+        top_idx = np.zeros((vectors.shape[0], k), dtype=np.intp)
+
+        # Closest clusters of every query in one multiply
+        centroid_scores = vectors @ self.centroids.T
+        probes = np.argpartition(centroid_scores, -self.n_probe, axis=1)[
+            :, -self.n_probe :
+        ]
+
+        added_vectors, added_ids = self.added
+
+        for row, (vector, lists) in enumerate(zip(vectors, probes)):
+            # Score each probed list as a contiguous slice, without copying it
+            blocks = [(self.offsets[i], self.offsets[i + 1]) for i in lists]
+            similarities = np.concatenate(
+                [self.vectors[start:end] @ vector for start, end in blocks]
+                + [added_vectors @ vector]
+            )
+            candidates = np.concatenate(
+                [self.order[start:end] for start, end in blocks] + [added_ids]
+            )
+
+            found = min(k, len(candidates))
+            if found == 0:
+                continue
+            best = np.argpartition(similarities, -found)[-found:]
+            top_scores[row, :found] = similarities[best]
+            top_idx[row, :found] = candidates[best]
+
+        return top_scores, top_idx
+
+
+def build_index(embeddings: np.ndarray, kind: str = "auto"):
+    """Build the route index of a matrix of utterance embeddings.
+
+    Args:
+        embeddings: Matrix of normalized utterance embeddings (n, dim).
+        kind: "brute" for the exact search, "ivf" for the approximate one, or
+            "auto" to use the approximate one only from `IVF_MIN_SIZE` utterances.
+
+    Returns:
+        The index, exposing `search(vectors, k)`.
+
+    Raises:
+        ValueError: If the index kind is unknown.
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind {kind!r}, expected one of {INDEX_KINDS}")
+
+    if kind == "ivf" or (kind == "auto" and embeddings.shape[0] >= IVF_MIN_SIZE):
+        return IVFIndex(embeddings)
+    return BruteForceIndex(embeddings)
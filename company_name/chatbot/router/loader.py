@@ -1,26 +1,107 @@
 import os
+from typing import List, Optional
 
-from semantic_router import RouteLayer
+from company_name.chatbot.router.artifact import (
+    compile_router,
+    load_artifact,
+    read_layer_config,
+)
+from company_name.chatbot.router.classifier import IntentClassifier
+from company_name.chatbot.router.encoders import MAX_LENGTH, TransformerEncoder
 
 FILENAME = "layer.json"
 BASE_DIR = os.path.dirname(__file__)
 FILE_PATH = os.path.join(BASE_DIR, FILENAME)
 
 
-def load_intention_classifier() -> RouteLayer:
+class LazyEncoder:
+    """Encoder that loads the underlying model the first time it is called."""
+
+    def __init__(self, encoder_type: str, encoder_name: str):
+        """Store the encoder settings without loading the model.
+
+        Args:
+            encoder_type: Type of the encoder, as in the `encoder_type` of the layer.
+            encoder_name: Name of the encoder model.
+        """
+        self.type = encoder_type
+        self.name = encoder_name
+        self._model = None
+
+    @property
+    def model(self):
+        """The underlying semantic-router encoder, loaded on first access."""
+        if self._model is None:
+            from semantic_router.encoders import AutoEncoder
+
+            self._model = AutoEncoder(type=self.type, name=self.name).model
+        return self._model
+
+    def __call__(self, docs: List[str]) -> List[List[float]]:
+        return self.model(docs)
+
+
+def load_intention_classifier(
+    file_path: Optional[str] = None,
+    backend: Optional[str] = None,
+    threads: Optional[int] = None,
+    max_length: int = MAX_LENGTH,
+    index: str = "auto",
+) -> IntentClassifier:
     """
-    Load json a file in the `router` folder.
+    Load the intention classifier compiled from a json file in the `router` folder.
+
+    The utterance embeddings are read from a memory-mapped artifact that is only
+    rebuilt when the contents of the file, the encoder name, the backend or its
+    maximum sequence length change.
+
+    Args:
+        file_path: Path to the route layer file, `layer.json` by default.
+        backend: Encoder backend, "fp32" or "int8", for a local Hugging Face
+            encoder with tuned threads and sequence length. Defaults to the
+            `encoder_backend` of the layer, or the semantic-router encoder.
+        threads: Number of intra-op threads of a backend encoder.
+        max_length: Maximum number of tokens per text of a backend encoder.
+        index: Kind of route index, "brute", "ivf" or "auto" to pick by size.
 
     Returns:
-        RouteLayer object to classify user intentions.
+        IntentClassifier object to classify user intentions.
 
     Raises:
-        ValueError: If the file type is not supported.
+        FileNotFoundError: If the route layer file does not exist.
+        ValueError: If a backend is requested for a non Hugging Face encoder.
 
     """
-    if not os.path.exists(FILE_PATH):
-        raise FileNotFoundError(f"File not found: {FILE_PATH}")
+    file_path = file_path or FILE_PATH
+    config = read_layer_config(file_path)
+    backend = backend or config.get("encoder_backend")
+
+    if backend is None:
+        encoder = LazyEncoder(config["encoder_type"], config["encoder_name"])
+    elif config["encoder_type"] != "huggingface":
+        raise ValueError(
+            f"Encoder backend {backend!r} requires a huggingface encoder, "
+            f"not {config['encoder_type']!r}"
+        )
+    else:
+        encoder = TransformerEncoder(
+            config["encoder_name"], backend, threads=threads, max_length=max_length
+        )
+
+    # Reuse the compiled artifact, encoding the utterances only when it is stale
+    artifact = load_artifact(file_path, config["encoder_name"], backend, max_length)
+    if artifact is None:
+        compile_router(file_path, encoder, config, backend, max_length)
+        artifact = load_artifact(file_path, config["encoder_name"], backend, max_length)
 
-    rl = RouteLayer.from_json(FILE_PATH)
+    embeddings, metadata = artifact
 
-    return rl
+    return IntentClassifier(
+        encoder=encoder,
+        embeddings=embeddings,
+        utterance_routes=metadata["utterance_routes"],
+        route_names=metadata["route_names"],
+        thresholds=metadata["thresholds"],
+        normalized=True,
+        index=index,
+    )
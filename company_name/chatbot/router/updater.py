@@ -0,0 +1,219 @@
+import atexit
+import os
+import threading
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from company_name.chatbot.router.artifact import (
+    load_artifact,
+    locked_layer,
+    read_layer_config,
+    write_artifact,
+    write_layer_config,
+)
+from company_name.chatbot.router.classifier import IntentClassifier
+from company_name.chatbot.router.encoders import MAX_LENGTH
+from company_name.chatbot.router.loader import FILE_PATH
+
+# Number of seconds between two writes of a route layer
+WRITE_INTERVAL = 60.0
+
+
+class LayerWriter:
+    """Appends labelled utterances to a route layer file in the background.
+
+    A background thread appends the queued utterances to the route layer file at
+    most once every `interval` seconds, and rewrites the compiled artifact from
+    the embeddings already computed, so the next process start neither
+    re-encodes the layer nor loses the updates. Each write holds an exclusive
+    lock on the layer, shared with the other processes updating it.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        backend: Optional[str] = None,
+        max_length: int = MAX_LENGTH,
+        interval: float = WRITE_INTERVAL,
+    ):
+        """Initialize the writer and start its thread.
+
+        Args:
+            file_path: Path to the route layer file.
+            backend: Encoder backend of the embeddings, defaults to the
+                `encoder_backend` of the layer.
+            max_length: Maximum number of tokens per text of a backend encoder.
+            interval: Number of seconds between two writes of the layer.
+        """
+        self.file_path = file_path
+        self.backend = backend
+        self.max_length = max_length
+        self.interval = interval
+
+        # Utterances queued since the last write, with their route and embedding
+        self._pending: List[Tuple[str, str, np.ndarray]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._writer = threading.Thread(
+            target=self._run, name="LayerWriter", daemon=True
+        )
+        self._writer.start()
+
+        # Make sure queued utterances reach the layer when the process exits
+        atexit.register(self.close)
+
+    def add(self, texts: List[str], routes: Sequence[str], vectors: np.ndarray) -> None:
+        """Queue labelled utterances for the next write.
+
+        Args:
+            texts: The new utterances.
+            routes: The route of each utterance.
+            vectors: Embeddings of the utterances.
+        """
+        with self._lock:
+            self._pending.extend(zip(texts, routes, vectors))
+
+    def flush(self) -> None:
+        """Write the queued utterances to the route layer file and its artifact."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        try:
+            with locked_layer(self.file_path):
+                self._write(pending)
+        except (IOError, OSError) as e:
+            print(f"Error writing the route layer {self.file_path}: {e}")
+            # Keep the utterances for the next attempt
+            with self._lock:
+                self._pending[:0] = pending
+
+    def _write(self, pending: List[Tuple[str, str, np.ndarray]]) -> None:
+        """Append utterances to the layer, then store the artifact of the new layer."""
+        config = read_layer_config(self.file_path)
+        backend = self.backend or config.get("encoder_backend")
+
+        # Embeddings of the current layer, if its artifact is up to date
+        artifact = load_artifact(
+            self.file_path, config["encoder_name"], backend, self.max_length
+        )
+
+        rows = {route["name"]: [] for route in config["routes"]}
+        if artifact is not None:
+            embeddings, metadata = artifact
+            for row, route in enumerate(metadata["utterance_routes"]):
+                rows[route].append(embeddings[row])
+
+        for route in config["routes"]:
+            for text, route_name, vector in pending:
+                if route_name == route["name"]:
+                    route["utterances"].append(text)
+                    rows[route_name].append(vector)
+
+        write_layer_config(self.file_path, config)
+
+        # Without an up-to-date artifact, the next load compiles the layer
+        if artifact is not None:
+            embeddings = np.stack(
+                [vector for route in config["routes"] for vector in rows[route["name"]]]
+            )
+            write_artifact(self.file_path, config, embeddings, backend, self.max_length)
+
+    def close(self) -> None:
+        """Stop the writer thread and write the queued utterances."""
+        if not self._writer.is_alive():
+            return
+        self._stop.set()
+        self._writer.join()
+        self.flush()
+
+    def _run(self) -> None:
+        """Write the queued utterances every `interval` seconds until `close`."""
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+@lru_cache(maxsize=None)
+def _get_layer_writer(
+    file_path: str, backend: Optional[str], max_length: int
+) -> LayerWriter:
+    """Create the writer of a route layer file once per process."""
+    return LayerWriter(file_path, backend, max_length)
+
+
+def get_layer_writer(
+    file_path: Optional[str] = None,
+    backend: Optional[str] = None,
+    max_length: int = MAX_LENGTH,
+) -> LayerWriter:
+    """
+    Get the writer of a route layer file, shared by every updater of the process.
+
+    Args:
+        file_path: Path to the route layer file, `layer.json` by default.
+        backend: Encoder backend of the embeddings, defaults to the
+            `encoder_backend` of the layer.
+        max_length: Maximum number of tokens per text of a backend encoder.
+
+    Returns:
+        The shared LayerWriter instance.
+    """
+    return _get_layer_writer(
+        os.path.abspath(file_path or FILE_PATH), backend, max_length
+    )
+
+
+class RouterUpdater:
+    """Applies labelled utterances to a live classifier and persists them.
+
+    Utterances are inserted into the running classifier as soon as they are
+    added, so corrections take effect on the next message, and are queued on
+    the writer of the route layer file, which every updater of the same file
+    shares.
+    """
+
+    def __init__(
+        self,
+        classifier: IntentClassifier,
+        file_path: Optional[str] = None,
+        backend: Optional[str] = None,
+        max_length: int = MAX_LENGTH,
+    ):
+        """Initialize the updater.
+
+        Args:
+            classifier: The live classifier, loaded from `file_path`.
+            file_path: Path to the route layer file, `layer.json` by default.
+            backend: Encoder backend of the classifier, defaults to the
+                `encoder_backend` of the layer.
+            max_length: Maximum number of tokens per text of a backend encoder.
+        """
+        self.classifier = classifier
+        self.writer = get_layer_writer(file_path, backend, max_length)
+
+    def add(
+        self,
+        texts: List[str],
+        routes: Sequence[str],
+        vectors: Optional[np.ndarray] = None,
+    ) -> None:
+        """Insert labelled utterances into the classifier and queue them for writing.
+
+        Args:
+            texts: The new utterances.
+            routes: The route of each utterance, which must already exist.
+            vectors: Embeddings of the utterances, encoded here if not given.
+
+        Raises:
+            ValueError: If a route does not exist.
+        """
+        vectors = self.classifier.add_utterances(texts, routes, vectors)
+        self.writer.add(texts, routes, vectors)
+
+    def flush(self) -> None:
+        """Write the queued utterances of the route layer file now."""
+        self.writer.flush()
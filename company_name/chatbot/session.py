@@ -0,0 +1,27 @@
+# Import necessary modules and classes
+from typing import Dict
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class SessionContext(BaseModel):
+    """Identity of a conversation, passed with every turn to a shared chatbot.
+
+    The context is immutable, so a single bot instance can serve many concurrent
+    conversations from threads or asyncio tasks without sharing mutable state.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    user_id: str = Field(description="Unique identifier for the user")
+    conversation_id: str = Field(description="Unique identifier for the conversation")
+
+    @property
+    def memory_config(self) -> Dict:
+        """Runnable configuration selecting the session history of the conversation."""
+        return {
+            "configurable": {
+                "user_id": self.user_id,
+                "conversation_id": self.conversation_id,
+            }
+        }
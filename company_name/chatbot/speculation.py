@@ -0,0 +1,118 @@
+# Import necessary modules and classes
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Dict, Iterable, Optional
+
+# Stages launched for the turn being processed, visible to the handlers it awaits
+_stages: contextvars.ContextVar[Optional[Dict[str, "SpeculativeStage"]]] = (
+    contextvars.ContextVar("speculative_stages", default=None)
+)
+
+
+class SpeculativeStage:
+    """A side-effect-free stage started before the intent of a turn is known."""
+
+    def __init__(self, coroutine: Awaitable):
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.task = asyncio.ensure_future(coroutine)
+        self.task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Future) -> None:
+        self.finished = time.perf_counter()
+        if not task.cancelled():
+            task.exception()  # Mark the error of a discarded stage as retrieved
+
+
+class Speculator:
+    """Runs side-effect-free stages ahead of intent classification.
+
+    A turn opens a scope with `begin`, launches stages for the intents it may
+    end up with, and handlers `take` the result of their stage instead of
+    recomputing it. `end` cancels the stages no handler took. The time spent on
+    discarded stages is reported as wasted, and the time a taken stage had
+    already been running when requested is reported as saved.
+    """
+
+    def __init__(self):
+        self.launched = 0
+        self.used = 0
+        self.cancelled = 0
+        self.wasted_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def begin(self) -> contextvars.Token:
+        """Open the speculation scope of a turn."""
+        return _stages.set({})
+
+    def launch(self, name: str, coroutine: Awaitable) -> None:
+        """Start a stage in the current scope, unless it is already running.
+
+        Args:
+            name: Name of the stage, usually the intent it belongs to.
+            coroutine: The side-effect-free work of the stage.
+        """
+        stages = _stages.get()
+        if stages is None or name in stages:
+            coroutine.close()
+            return
+
+        stages[name] = SpeculativeStage(coroutine)
+        self.launched += 1
+
+    async def take(self, name: str, default: Any = None) -> Any:
+        """Wait for the result of a stage launched in the current scope.
+
+        Args:
+            name: Name of the stage.
+            default: Value returned if the stage was not launched.
+
+        Returns:
+            The result of the stage, or `default`.
+        """
+        stages = _stages.get()
+        if stages is None or name not in stages:
+            return default
+
+        stage = stages.pop(name)
+        requested = time.perf_counter()
+        result = await stage.task
+
+        # The done callback may not have run yet, the stage finished just now then
+        finished = stage.finished or time.perf_counter()
+        self.used += 1
+        self.saved_seconds += min(requested, finished) - stage.started
+        return result
+
+    def prune(self, keep: Iterable[str] = ()) -> None:
+        """Cancel the stages of the current scope that are no longer needed.
+
+        Args:
+            keep: Names of the stages to keep running.
+        """
+        stages = _stages.get() or {}
+        now = time.perf_counter()
+
+        for name in [name for name in stages if name not in set(keep)]:
+            stage = stages.pop(name)
+            if not stage.task.done():
+                stage.task.cancel()
+            self.cancelled += 1
+            self.wasted_seconds += (stage.finished or now) - stage.started
+
+    def end(self, token: contextvars.Token) -> None:
+        """Close the scope of a turn, cancelling the stages no handler took."""
+        self.prune()
+        _stages.reset(token)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Counters of launched, used and cancelled stages, with wasted and saved time."""
+        return {
+            "launched": self.launched,
+            "used": self.used,
+            "cancelled": self.cancelled,
+            "wasted_seconds": self.wasted_seconds,
+            "saved_seconds": self.saved_seconds,
+        }
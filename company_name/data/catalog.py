@@ -0,0 +1,242 @@
+import json
+import math
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+from company_name.data.loader import load_database_file
+
+# Minimum similarity, between 0 and 1, for a fuzzy match to be accepted
+DEFAULT_CUTOFF = 0.75
+
+# Maximum number of trigram candidates scored with the edit distance
+MAX_CANDIDATES = 8
+
+# Maximum number of resolved spellings remembered by each index
+CACHE_SIZE = 10000
+
+
+def normalize(text: str) -> str:
+    """Normalize a name for matching: lowercase alphanumeric characters only.
+
+    Args:
+        text: The name to normalize.
+
+    Returns:
+        The normalized name, e.g. "cineview4ktv" for "CineView 4K TV".
+    """
+    return re.sub(r"[^0-9a-z]", "", text.lower())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the character trigrams of a normalized name, padded at both ends."""
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """Compute the Levenshtein distance between two strings.
+
+    Args:
+        a: The first string.
+        b: The second string.
+        max_distance: Stop early once the distance is known to exceed this bound.
+
+    Returns:
+        The edit distance, or `max_distance + 1` if it exceeds `max_distance`.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,  # Deletion
+                    current[j - 1] + 1,  # Insertion
+                    previous[j - 1] + (char_a != char_b),  # Substitution
+                )
+            )
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return previous[-1]
+
+
+class _FuzzyIndex:
+    """Index resolving approximate spellings of a set of aliases to their targets."""
+
+    def __init__(self):
+        self.aliases: Dict[str, Set[str]] = {}  # Normalized alias -> targets
+        self.grams: Dict[str, Set[str]] = {}  # Trigram -> normalized aliases
+        self._cache: Dict = {}  # (text, cutoff) -> resolved target
+        self._cache_lock = threading.Lock()
+
+    def add(self, alias: str, target: str) -> None:
+        """Register an alias of a target."""
+        key = normalize(alias)
+        if not key:
+            return
+
+        with self._cache_lock:
+            self._cache.clear()
+
+        self.aliases.setdefault(key, set()).add(target)
+        for gram in trigrams(key):
+            self.grams.setdefault(gram, set()).add(key)
+
+    def resolve(self, text: str, cutoff: float) -> Optional[str]:
+        """Resolve a text to a single target, or None if it is unknown or ambiguous."""
+        key = (text, cutoff)
+        with self._cache_lock:
+            if key in self._cache:
+                return self._cache[key]
+
+        # Resolve outside the lock, a concurrent miss only duplicates the work
+        target = self._resolve(text, cutoff)
+
+        with self._cache_lock:
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = target
+        return target
+
+    def _resolve(self, text: str, cutoff: float) -> Optional[str]:
+        """Resolve a text without going through the cache."""
+        key = normalize(text)
+        if not key:
+            return None
+
+        # Exact match on the normalized alias
+        if key in self.aliases:
+            targets = self.aliases[key]
+            return next(iter(targets)) if len(targets) == 1 else None
+
+        # Shortlist the aliases sharing the most trigrams with the text
+        query_grams = trigrams(key)
+        counts: Dict[str, int] = {}
+        for gram in query_grams:
+            for alias in self.grams.get(gram, ()):
+                counts[alias] = counts.get(alias, 0) + 1
+        candidates = sorted(counts, key=counts.get, reverse=True)[:MAX_CANDIDATES]
+
+        # Score the shortlist with the edit distance, pruning hopeless candidates.
+        # The bound is rounded up, so candidates tying with the best are still
+        # scored and make the text ambiguous.
+        best_score, best_targets = 0.0, set()
+        for alias in candidates:
+            length = max(len(key), len(alias))
+            max_distance = math.ceil(length * (1 - max(cutoff, best_score)))
+            distance = edit_distance(key, alias, max_distance)
+            if distance > max_distance:
+                continue
+
+            score = 1 - distance / length
+            if score > best_score:
+                best_score, best_targets = score, set(self.aliases[alias])
+            elif score == best_score:
+                best_targets |= self.aliases[alias]
+
+        if best_score < cutoff or len(best_targets) != 1:
+            return None
+        return next(iter(best_targets))
+
+
+class ProductCatalog:
+    """Product catalog indexed by name, alias, model number and category.
+
+    Names are resolved exactly first, then through their normalized form, and
+    finally through a trigram shortlist scored with the edit distance, so that
+    spellings such as "CineView 4k" or "ProPhone" still find their product.
+    """
+
+    def __init__(self, products: Dict[str, Dict]):
+        """Index a catalog of products.
+
+        Args:
+            products: Mapping of product names to product records.
+        """
+        self.products = products
+
+        # Product names by category and rendered snippet of each product
+        self.category_index: Dict[str, List[str]] = {}
+        self.snippets: Dict[str, str] = {}
+
+        self._product_index = _FuzzyIndex()
+        self._category_index = _FuzzyIndex()
+
+        for name, product in products.items():
+            self.category_index.setdefault(product["category"], []).append(name)
+            self.snippets[name] = json.dumps(product, indent=4) + "\n"
+
+            # Index the name, the name without its brand and the model number
+            self._product_index.add(name, name)
+            brand = product.get("brand") or ""
+            if brand and name.startswith(brand):
+                self._product_index.add(name[len(brand) :], name)
+            if product.get("model_number"):
+                self._product_index.add(product["model_number"], name)
+
+        for category in self.category_index:
+            self._category_index.add(category, category)
+
+    def resolve(self, name: str, cutoff: float = DEFAULT_CUTOFF) -> Optional[str]:
+        """Resolve a possibly misspelled product name to its catalog name.
+
+        Args:
+            name: The product name, brand-less name or model number to resolve.
+            cutoff: Minimum similarity for a fuzzy match.
+
+        Returns:
+            The catalog name of the product, or None if no single product matches.
+        """
+        if name in self.products:
+            return name
+        return self._product_index.resolve(name, cutoff)
+
+    def resolve_category(
+        self, category: str, cutoff: float = DEFAULT_CUTOFF
+    ) -> Optional[str]:
+        """Resolve a possibly misspelled category name.
+
+        Args:
+            category: The category name to resolve.
+            cutoff: Minimum similarity for a fuzzy match.
+
+        Returns:
+            The catalog name of the category, or None if no single category matches.
+        """
+        if category in self.category_index:
+            return category
+        return self._category_index.resolve(category, cutoff)
+
+    def get(self, name: str) -> Optional[Dict]:
+        """Retrieve a product by a possibly misspelled name."""
+        resolved = self.resolve(name)
+        return self.products[resolved] if resolved else None
+
+    def get_by_category(self, category: str) -> List[Dict]:
+        """Retrieve the products of a possibly misspelled category."""
+        resolved = self.resolve_category(category)
+        return [self.products[name] for name in self.category_index.get(resolved, [])]
+
+
+@lru_cache(maxsize=None)
+def get_product_catalog(filename: str = "products_catalog.pkl") -> ProductCatalog:
+    """
+    Load and index a product catalog once per process.
+
+    Args:
+        filename (str): The name of the pickled catalog in the `database` folder.
+
+    Returns:
+        The shared ProductCatalog instance.
+    """
+    return ProductCatalog(load_database_file(filename))
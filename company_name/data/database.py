@@ -0,0 +1,256 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from company_name.data.loader import get_sqlite_database_path
+
+# Number of idle connections kept open by each database
+POOL_SIZE = 4
+
+# Number of prepared statements cached by each connection
+STATEMENT_CACHE_SIZE = 128
+
+# Maximum number of query results kept by the result cache
+RESULT_CACHE_SIZE = 256
+
+
+class ProductRow(NamedTuple):
+    """A row of the `products` table."""
+
+    product_id: int
+    name: str
+    category: str
+    brand: str
+    model_number: str
+    warranty: str
+    rating: float
+    features: str
+    description: str
+    price: float
+
+
+class OrderRow(NamedTuple):
+    """A row of the `orders` table joined with the name of its product."""
+
+    order_id: int
+    customer_id: int
+    product_id: int
+    product_name: str
+    quantity: int
+    total_amount: float
+    order_date: str
+
+
+class Database:
+    """Read-only access layer over a SQLite database, shared by chains and agents.
+
+    Connections are opened in read-only mode and pooled, and each one caches its
+    prepared statements, so repeated parameterized queries are not re-parsed.
+    Results of `cached_query` are kept until the schema or the file changes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        pool_size: int = POOL_SIZE,
+        cache_size: int = RESULT_CACHE_SIZE,
+    ):
+        """Initialize the access layer.
+
+        Args:
+            path: Path to the SQLite database file.
+            pool_size: Maximum number of idle connections kept open.
+            cache_size: Maximum number of query results kept by the result cache.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File not found: {path}")
+
+        self.path = path
+        self.cache_size = cache_size
+
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=pool_size)
+        self._cache: Dict[Tuple, List] = {}
+        self._cache_version: Optional[Tuple] = None
+        self._lock = threading.Lock()
+
+        # Result cache counters
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new read-only connection."""
+        connection = sqlite3.connect(
+            f"file:{self.path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection from the pool, returning it once done."""
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+
+        try:
+            yield connection
+        finally:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+    def query(
+        self, sql: str, params: Sequence[Any] = (), row_type: Optional[type] = None
+    ) -> List:
+        """Run a parameterized query.
+
+        Args:
+            sql: The SQL statement, with `?` or `:name` placeholders.
+            params: The values bound to the placeholders.
+            row_type: Type built from each row by column name, e.g. a NamedTuple.
+
+        Returns:
+            The rows, as `row_type` instances or `sqlite3.Row` objects.
+        """
+        with self.connection() as connection:
+            rows = connection.execute(sql, params).fetchall()
+
+        if row_type is None:
+            return rows
+        return [row_type(**dict(zip(row.keys(), row))) for row in rows]
+
+    def version(self) -> Tuple:
+        """Return a token that changes whenever the schema or the data changes."""
+        stat = os.stat(self.path)
+        with self.connection() as connection:
+            schema_version = connection.execute("PRAGMA schema_version").fetchone()[0]
+        return schema_version, stat.st_mtime_ns, stat.st_size
+
+    def cached_query(
+        self, sql: str, params: Sequence[Any] = (), row_type: Optional[type] = None
+    ) -> List:
+        """Run a parameterized query through the result cache.
+
+        Meant for catalog-style queries whose results rarely change. The cache is
+        dropped whenever the schema version or the database file changes.
+
+        Args:
+            sql: The SQL statement, with `?` or `:name` placeholders.
+            params: The values bound to the placeholders.
+            row_type: Type built from each row by column name, e.g. a NamedTuple.
+
+        Returns:
+            The rows, as `row_type` instances or `sqlite3.Row` objects.
+        """
+        key = (sql, tuple(params), row_type)
+        version = self.version()
+
+        with self._lock:
+            if version != self._cache_version:
+                self._cache.clear()
+                self._cache_version = version
+            if key in self._cache:
+                self.hits += 1
+                return list(self._cache[key])
+
+        rows = self.query(sql, params, row_type)
+        self.misses += 1
+
+        with self._lock:
+            if self._cache_version == version:
+                if len(self._cache) >= self.cache_size:
+                    self._cache.pop(next(iter(self._cache)))  # Oldest entry
+                self._cache[key] = rows
+
+        return list(rows)
+
+    def invalidate(self) -> None:
+        """Drop every cached result."""
+        with self._lock:
+            self._cache.clear()
+            self._cache_version = None
+
+    def close(self) -> None:
+        """Close the idle connections of the pool."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Result cache counters."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+    def get_product_names(self) -> List[str]:
+        """Return the names of every product, in catalog order."""
+        rows = self.cached_query("SELECT name FROM products ORDER BY product_id")
+        return [row["name"] for row in rows]
+
+    def get_products(self) -> List[ProductRow]:
+        """Return every product of the catalog."""
+        return self.cached_query(
+            "SELECT * FROM products ORDER BY product_id", row_type=ProductRow
+        )
+
+    def get_product(self, name: str) -> Optional[ProductRow]:
+        """Return a product by its exact name, or None if it does not exist."""
+        rows = self.cached_query(
+            "SELECT * FROM products WHERE name = ?", (name,), row_type=ProductRow
+        )
+        return rows[0] if rows else None
+
+    def get_customer_orders(
+        self, customer_id: int, order_id: Optional[int] = None
+    ) -> List[OrderRow]:
+        """Return the orders of a customer, or one of them if `order_id` is given.
+
+        Args:
+            customer_id: Identifier of the customer owning the orders.
+            order_id: Identifier of a single order to look up.
+
+        Returns:
+            The matching orders with the name of their product, newest first.
+        """
+        sql = """
+            SELECT o.order_id, o.customer_id, o.product_id, p.name AS product_name,
+                   o.quantity, o.total_amount, o.order_date
+            FROM orders o JOIN products p ON p.product_id = o.product_id
+        """
+
+        # A single order is searched by primary key, then checked against the customer
+        if order_id is not None:
+            sql += "WHERE o.order_id = ? AND o.customer_id = ?"
+            return self.query(sql, (order_id, customer_id), row_type=OrderRow)
+
+        sql += "WHERE o.customer_id = ? ORDER BY o.order_date DESC, o.order_id DESC"
+        return self.query(sql, (customer_id,), row_type=OrderRow)
+
+
+@lru_cache(maxsize=None)
+def _get_database(path: str) -> Database:
+    """Create the access layer of a database file once per process."""
+    return Database(path)
+
+
+def get_database(path: Optional[str] = None) -> Database:
+    """
+    Return the access layer of a SQLite database, shared by the whole process.
+
+    Args:
+        path (str): Path to the database file, `ecommerce.db` by default.
+
+    Returns:
+        The shared Database instance.
+    """
+    return _get_database(os.path.abspath(path or get_sqlite_database_path()))
@@ -0,0 +1,207 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from company_name.data.catalog import ProductCatalog, get_product_catalog
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase a text and collapse every run of non-alphanumeric characters to a space.
+
+    The result is padded with spaces so patterns normalized the same way only
+    match on word boundaries.
+    """
+    return " " + " ".join(re.findall(r"[0-9a-z]+", text.lower())) + " "
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton finding every occurrence of many patterns in one pass."""
+
+    def __init__(self, patterns: Iterable[str]):
+        """Build the automaton.
+
+        Args:
+            patterns: The patterns to search for.
+        """
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        # Build the trie of the patterns
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(len(self.patterns))
+            self.patterns.append(pattern)
+
+        # Compute the failure links breadth-first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                if self._fail[child] == child:
+                    self._fail[child] = 0
+                self._output[child] = (
+                    self._output[child] + self._output[self._fail[child]]
+                )
+
+    def search(self, text: str) -> List[Tuple[int, int, int]]:
+        """Find every occurrence of the patterns in a text.
+
+        Args:
+            text: The text to search.
+
+        Returns:
+            A list of (start, end, pattern index) tuples.
+        """
+        matches = []
+        state = 0
+
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for index in self._output[state]:
+                matches.append(
+                    (position + 1 - len(self.patterns[index]), position + 1, index)
+                )
+
+        return matches
+
+
+class ProductMentions(NamedTuple):
+    """Products and categories mentioned in a message."""
+
+    products: List[str]
+    categories: List[str]
+
+
+class ProductMentionMatcher:
+    """Local matcher of the products and categories mentioned in a customer message.
+
+    Product names, model numbers, unambiguous brand-less names and category names
+    are compiled into one Aho-Corasick automaton. A message is resolved locally
+    only when every mention is unambiguous; otherwise `match` returns None and
+    the caller falls back to the language model.
+    """
+
+    def __init__(
+        self,
+        catalog: Optional[ProductCatalog] = None,
+        categories: Optional[Iterable[str]] = None,
+    ):
+        """Compile the patterns of a catalog.
+
+        Args:
+            catalog: The product catalog, the shared catalog by default.
+            categories: The category names to match, those of the catalog by default.
+        """
+        catalog = catalog or get_product_catalog()
+        categories = list(categories or catalog.category_index)
+
+        # Pattern -> ("product" | "category", target), None marking an ambiguous term
+        self._targets: Dict[str, Optional[Tuple[str, str]]] = {}
+
+        lowered_names = [name.lower() for name in catalog.products]
+        for name, product in catalog.products.items():
+            self._add(name, ("product", name))
+            if product.get("model_number"):
+                self._add(product["model_number"], ("product", name))
+
+            brand = product.get("brand") or ""
+            if brand:
+                self._add(brand, None)  # A brand alone does not identify a product
+
+            # Keep the name without its brand if no other product name contains it
+            if brand and name.startswith(brand):
+                alias = name[len(brand) :].strip()
+                shared = sum(alias.lower() in other for other in lowered_names) > 1
+                distinctive = len(alias.split()) > 1 or alias[1:] != alias[1:].lower()
+                self._add(
+                    alias, ("product", name) if distinctive and not shared else None
+                )
+
+        for category in categories:
+            self._add(category, ("category", category))
+
+            # Each part of a category name ("Cameras", "Camcorders") and its singular
+            for part in re.split(r",| and ", category):
+                part = part.strip()
+                self._add(part, ("category", category))
+                if part.endswith("s"):
+                    self._add(part[:-1], ("category", category))
+
+        self._automaton = AhoCorasick(self._targets)
+
+        # Fast path counters
+        self.hits = 0
+        self.misses = 0
+        self.ambiguous = 0
+
+    def _add(self, term: str, target: Optional[Tuple[str, str]]) -> None:
+        """Register a pattern, marking it ambiguous if it maps to several targets."""
+        pattern = normalize_text(term)
+        if not pattern.strip():
+            return
+
+        if pattern in self._targets and self._targets[pattern] != target:
+            self._targets[pattern] = None
+        else:
+            self._targets[pattern] = target
+
+    def match(self, text: str) -> Optional[ProductMentions]:
+        """Find the products and categories mentioned in a message.
+
+        Args:
+            text: The customer message.
+
+        Returns:
+            The mentions, or None if nothing was found or a mention is ambiguous.
+        """
+        normalized = normalize_text(text)
+        matches = self._automaton.search(normalized)
+
+        # Keep the leftmost-longest matches; patterns share their padding spaces
+        matches.sort(key=lambda match: (match[0], -(match[1] - match[0])))
+        selected, end = [], 0
+        for start, stop, index in matches:
+            if start >= end - 1:
+                selected.append(self._automaton.patterns[index])
+                end = stop
+
+        targets = [self._targets[pattern] for pattern in selected]
+
+        if not targets:
+            self.misses += 1
+            return None
+        if any(target is None for target in targets):
+            self.ambiguous += 1
+            return None
+
+        self.hits += 1
+        products = list(dict.fromkeys(t[1] for t in targets if t[0] == "product"))
+        categories = list(dict.fromkeys(t[1] for t in targets if t[0] == "category"))
+        return ProductMentions(products=products, categories=categories)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Hit, miss and ambiguity counters of the fast path, with its hit rate."""
+        total = self.hits + self.misses + self.ambiguous
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "ambiguous": self.ambiguous,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
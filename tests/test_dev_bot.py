@@ -0,0 +1,104 @@
+import json
+import re
+import zlib
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from company_name.chatbot.dev_bot import DevChatbot
+from company_name.chatbot.memory import MemoryManager
+from company_name.chatbot.router import auxiliar
+from company_name.chatbot.router.artifact import read_layer_config
+from company_name.chatbot.router.auxiliar import load_messages
+from company_name.chatbot.router.classifier import IntentClassifier
+
+ROUTES = {
+    "order_status": ["where is my order", "track my order"],
+    "product_information": ["tell me about this laptop", "what does the phone cost"],
+}
+
+
+def hashing_encoder(texts: List[str]) -> np.ndarray:
+    """Embed texts as hashed bags of words, without any model."""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"[0-9a-z]+", text.lower()):
+            vectors[row, zlib.crc32(word.encode("utf-8")) % 64] += 1.0
+    return vectors
+
+
+@pytest.fixture
+def dev_bot(tmp_path, monkeypatch):
+    # Keep the message store and the route layer out of the repository
+    monkeypatch.setattr(auxiliar, "BASE_DIR", str(tmp_path))
+    layer_path = tmp_path / "layer.json"
+    layer_path.write_text(
+        json.dumps(
+            {
+                "encoder_type": "huggingface",
+                "encoder_name": "hashing",
+                "routes": [
+                    {"name": name, "utterances": list(utterances)}
+                    for name, utterances in ROUTES.items()
+                ],
+            }
+        )
+    )
+
+    utterances = [text for texts in ROUTES.values() for text in texts]
+    classifier = IntentClassifier(
+        hashing_encoder,
+        hashing_encoder(utterances),
+        [name for name, texts in ROUTES.items() for _ in texts],
+        list(ROUTES),
+        [0.0] * len(ROUTES),
+    )
+
+    bot = DevChatbot(
+        "developer",
+        "corrections",
+        list(ROUTES),
+        layer_path=str(layer_path),
+        llm=FakeListChatModel(responses=["Sure."]),
+        agent=RunnableLambda(lambda inputs: {"output": "Done."}),
+        rag=RunnableLambda(lambda inputs: AIMessage(content="Done.")),
+        intention_classifier=classifier,
+        memory=MemoryManager(
+            spill_path=str(tmp_path / "sessions.db"), journal_dir=str(tmp_path)
+        ),
+    )
+    yield bot
+    bot.router_updater.writer.close()
+
+
+def test_dev_bot_logs_in(dev_bot):
+    assert dev_bot.session.user_id == "developer"
+    assert dev_bot.session.conversation_id == "corrections"
+
+
+def test_correction_updates_router(dev_bot, monkeypatch):
+    message = "where can I find the laptop order"
+    assert dev_bot.get_user_intent({"customer_input": message}) == "order_status"
+
+    # Reject the predicted intention, then pick product_information
+    answers = iter(["n", "2"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    response = dev_bot.process_user_input({"customer_input": message})
+
+    assert response == "New intention added successfully."
+    assert dev_bot.get_user_intent({"customer_input": message}) == (
+        "product_information"
+    )
+    assert load_messages("new_intentions.json") == [
+        {"Intention": "product_information", "Message": message, "Id": 1}
+    ]
+
+    dev_bot.router_updater.flush()
+    config = read_layer_config(dev_bot.router_updater.writer.file_path)
+    routes = {route["name"]: route["utterances"] for route in config["routes"]}
+    assert message in routes["product_information"]
+    assert message not in routes["order_status"]